@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AuthenticateAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "authenticate_app"
+
+    def ready(self):
+        from . import connections, instrumentation, signals  # noqa: F401
+
+        connections.connect()
+        instrumentation.connect()
@@ -0,0 +1,192 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import (
+    acurrent_version,
+    adeveloper_app_ids,
+    adeveloper_exists,
+    aapp_developer_id,
+    ais_registered,
+    auser_exists,
+    confirm_response_cache,
+)
+from .hashing import HashingPoolSaturated, aauthenticate
+from .revocation import is_revoked, revocation_list
+from .tokens import atoken_app_ids
+from .views import (
+    confirm_credentials,
+    confirm_developer_from_claims,
+    confirmation_http_response,
+    confirmation_key,
+    confirmation_owner,
+    encoded_confirmation,
+    issue_tokens,
+    login_overloaded,
+    token_claims,
+    trusts_claims,
+)
+
+
+def request_data(request):
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return {}
+        return data if type(data) == dict else {}
+    return request.POST
+
+
+@csrf_exempt
+@require_POST
+async def login_view(request):
+    data = request_data(request)
+    try:
+        user = await aauthenticate(data.get("username"), data.get("password"), request)
+    except HashingPoolSaturated:
+        return login_overloaded(JsonResponse)
+    if user:
+        payload = await sync_to_async(issue_tokens)(user, data.get("app_id"))
+        return JsonResponse(payload, status=status.HTTP_200_OK)
+
+    return JsonResponse({"error": "Unauthorized"}, status=401)
+
+
+async def adeveloper_confirmation(request, query_app_id=None):
+    """Confirms Developer without blocking the event loop"""
+    claims = token_claims(request)
+    payload = confirm_credentials(request, claims)
+    if isinstance(payload, Response):
+        return payload
+    app_id = payload.get("app_id") if payload.get("app_id") else query_app_id
+    developer_id = payload.get("developer_id")
+
+    # A compact token needs the membership set; the async path below
+    # loads it without blocking.
+    if trusts_claims("confirm_developer") and "app_count" not in claims:
+        response = confirm_developer_from_claims(claims, developer_id, app_id)
+        if response is not None:
+            return response
+
+    app_ids = await atoken_app_ids(claims) if app_id and type(app_id) == str else None
+    if app_ids:
+        if app_id not in app_ids or app_id not in await adeveloper_app_ids(
+            developer_id
+        ):
+            return Response(
+                {
+                    "valid": False,
+                    "message": f"{['Invalid app_id', 'not in developer app']}",
+                },
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+        return Response(
+            {
+                "valid": True,
+                "developer_id": f"{developer_id}",
+                "app_id": f"{app_id}",
+                "message": "Developer confirmed",
+            },
+            status=status.HTTP_200_OK,
+        )
+
+    if developer_id and type(developer_id) == str:
+        if await adeveloper_exists(developer_id):
+            return Response(
+                {
+                    "valid": True,
+                    "developer_id": f"{developer_id}",
+                    "app_id": f"{app_id}",
+                    "message": "Developer confirmed",
+                },
+                status=status.HTTP_200_OK,
+            )
+    return Response(
+        {"valid": False, "message": "Unauthorized"},
+        status=status.HTTP_401_UNAUTHORIZED,
+    )
+
+
+async def auser_confirmation(request, query_app_id=None):
+    """Confirms User without blocking the event loop"""
+    claims = token_claims(request)
+    payload = confirm_credentials(request, claims)
+    if isinstance(payload, Response):
+        return payload
+    app_id = payload.get("app_id") if payload.get("app_id") else query_app_id
+    user_id = payload.get("user_id")
+
+    trusted = (
+        trusts_claims("confirm_user") and user_id and claims.get("user_id") == user_id
+    )
+    if trusted and is_revoked(claims):
+        return Response(
+            {"valid": False, "message": "Token revoked"},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    if user_id and (trusted or await auser_exists(user_id)):
+        if app_id:
+            if not trusted and await aapp_developer_id(app_id) is None:
+                return Response(
+                    {"valid": False, "message": "Invalid app_id"},
+                    status=status.HTTP_401_UNAUTHORIZED,
+                )
+            if not await ais_registered(user_id, app_id):
+                return Response(
+                    {
+                        "valid": False,
+                        "message": f"{['Invalid app_id', 'User not Registered to app']}",
+                    },
+                    status=status.HTTP_401_UNAUTHORIZED,
+                )
+        return Response(
+            {
+                "valid": True,
+                "user_id": f"{user_id}",
+                "app_id": f"{app_id}",
+                "message": "User confirmed",
+            },
+            status=status.HTTP_200_OK,
+        )
+    return Response(
+        {"valid": False, "message": "Unauthorized"},
+        status=status.HTTP_401_UNAUTHORIZED,
+    )
+
+
+async def aconfirmation_response(kind, request, confirm):
+    """Async twin of views.confirmation_response: same key, cache and bytes"""
+    await revocation_list.async_sync()
+    query_app_id = request.GET.get("app_id")
+    membership, owner_id = confirmation_owner(kind, request, token_claims(request))
+    version = await acurrent_version(membership, owner_id) if owner_id else None
+    key = confirmation_key(kind, request, query_app_id, version)
+    entry = confirm_response_cache.get(key)
+    if entry is None:
+        entry = encoded_confirmation(await confirm(request, query_app_id))
+        confirm_response_cache.set(key, entry)
+    return confirmation_http_response(request, entry)
+
+
+@require_GET
+async def confirm_developer(request):
+    """Confirms Developer"""
+    return await aconfirmation_response("developer", request, adeveloper_confirmation)
+
+
+@require_GET
+async def confirm_user(request):
+    return await aconfirmation_response("user", request, auser_confirmation)
+
+
+ASYNC_CONFIRMATIONS = {
+    "developer": adeveloper_confirmation,
+    "user": auser_confirmation,
+}
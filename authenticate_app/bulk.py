@@ -0,0 +1,153 @@
+import codecs
+import csv
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from rest_framework import serializers
+from rest_framework.parsers import BaseParser
+
+from .models import App, CustomUser, UserAppRegistration
+from .signals import invalidate_user_apps
+
+
+class CSVParser(BaseParser):
+    """Parses a CSV body lazily into one dict per row, keyed by the header"""
+
+    media_type = "text/csv"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get("encoding", settings.DEFAULT_CHARSET)
+        return csv.DictReader(codecs.iterdecode(stream, encoding))
+
+
+class BulkUserSerializer(serializers.ModelSerializer):
+    """Row validation without the per-row username uniqueness query"""
+
+    class Meta:
+        model = CustomUser
+        fields = ["username", "email", "phone_number", "address", "password"]
+        extra_kwargs = {
+            "username": {"validators": [UnicodeUsernameValidator()]},
+            "email": {"required": True},
+        }
+
+
+def chunked(rows, size):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def hash_passwords(passwords):
+    with ThreadPoolExecutor(
+        max_workers=settings.BULK_IMPORT["HASH_WORKERS"],
+        thread_name_prefix="bulk-hashing",
+    ) as executor:
+        return list(executor.map(make_password, passwords))
+
+
+def import_users(rows):
+    """Creates users in chunks; returns counts and per-row errors"""
+    report = {"created": 0, "skipped": 0, "errors": []}
+    seen = set()
+    offset = 0
+    for chunk in chunked(rows, settings.BULK_IMPORT["CHUNK_SIZE"]):
+        valid = []
+        for number, row in enumerate(chunk, start=offset + 1):
+            serializer = BulkUserSerializer(data=row)
+            if not serializer.is_valid():
+                report["errors"].append({"row": number, "errors": serializer.errors})
+            elif serializer.validated_data["username"] in seen:
+                report["errors"].append(
+                    {"row": number, "errors": {"username": ["Duplicate in import."]}}
+                )
+            else:
+                seen.add(serializer.validated_data["username"])
+                valid.append((number, serializer.validated_data))
+        offset += len(chunk)
+
+        existing = set(
+            CustomUser.objects.filter(
+                username__in=[data["username"] for _, data in valid]
+            ).values_list("username", flat=True)
+        )
+        for number, data in valid:
+            if data["username"] in existing:
+                report["errors"].append(
+                    {"row": number, "errors": {"username": ["Already exists."]}}
+                )
+        valid = [
+            (number, data) for number, data in valid if data["username"] not in existing
+        ]
+
+        passwords = hash_passwords([data["password"] for _, data in valid])
+        users = [
+            CustomUser(**{**data, "password": password})
+            for (_, data), password in zip(valid, passwords)
+        ]
+        CustomUser.objects.bulk_create(users, ignore_conflicts=True)
+        created = CustomUser.objects.filter(id__in=[user.id for user in users]).count()
+        report["created"] += created
+        report["skipped"] += len(users) - created
+    return report
+
+
+def import_registrations(rows):
+    """Registers users to apps in chunks, leaning on the (user, app) unique
+    constraint for duplicates; returns counts and per-row errors"""
+    report = {"created": 0, "skipped": 0, "errors": []}
+    offset = 0
+    for chunk in chunked(rows, settings.BULK_IMPORT["CHUNK_SIZE"]):
+        pairs = []
+        for number, row in enumerate(chunk, start=offset + 1):
+            user_id = row.get("user") if type(row) == dict else None
+            app_id = row.get("app") if type(row) == dict else None
+            if not user_id or not app_id:
+                error = "user and app are required."
+            elif type(user_id) != str or type(app_id) != str:
+                error = "user and app must be ids."
+            else:
+                pairs.append((number, user_id, app_id))
+                continue
+            report["errors"].append(
+                {"row": number, "errors": {"non_field_errors": [error]}}
+            )
+        offset += len(chunk)
+
+        users = set(
+            CustomUser.objects.filter(
+                id__in={user_id for _, user_id, _ in pairs}
+            ).values_list("id", flat=True)
+        )
+        apps = set(
+            App.objects.filter(id__in={app_id for _, _, app_id in pairs}).values_list(
+                "id", flat=True
+            )
+        )
+        registrations = []
+        for number, user_id, app_id in pairs:
+            errors = {}
+            if user_id not in users:
+                errors["user"] = [f'Invalid pk "{user_id}" - object does not exist.']
+            if app_id not in apps:
+                errors["app"] = [f'Invalid pk "{app_id}" - object does not exist.']
+            if errors:
+                report["errors"].append({"row": number, "errors": errors})
+            else:
+                registrations.append(
+                    UserAppRegistration(user_id=user_id, app_id=app_id)
+                )
+
+        UserAppRegistration.objects.bulk_create(registrations, ignore_conflicts=True)
+        created = UserAppRegistration.objects.filter(
+            id__in=[registration.id for registration in registrations]
+        ).count()
+        report["created"] += created
+        report["skipped"] += len(registrations) - created
+        # bulk_create sends no post_save, so drop the cached memberships here.
+        for user_id in {registration.user_id for registration in registrations}:
+            invalidate_user_apps(user_id)
+    return report
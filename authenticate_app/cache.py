@@ -0,0 +1,391 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .membership import membership_index
+from .models import App, CustomUser, Developer, UserAppRegistration
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after a TTL"""
+
+    def __init__(self, name, max_size=10000, ttl=60):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_set(self, key, loader, ttl=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value, ttl)
+        return value
+
+    async def aget_or_set(self, key, aloader, ttl=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = await aloader()
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _lookup_cache(name):
+    config = settings.AUTH_LOOKUP_CACHE
+    return LRUCache(name, max_size=config["MAX_SIZE"], ttl=config["TTL"])
+
+
+user_cache = _lookup_cache("user")
+developer_cache = _lookup_cache("developer")
+app_cache = _lookup_cache("app")
+registration_cache = _lookup_cache("registration")
+developer_apps_cache = _lookup_cache("developer_apps")
+claims_cache = _lookup_cache("claims")
+# Encoded confirm answers; cleared on any model change in this worker.
+confirm_response_cache = _lookup_cache("confirm_response")
+
+
+def user_exists(user_id):
+    """Cached check that a user with `user_id` exists"""
+    return user_cache.get_or_set(
+        user_id, lambda: CustomUser.objects.filter(id=user_id).exists()
+    )
+
+
+def developer_exists(developer_id, user_id=None):
+    """Cached check for a developer, optionally owned by `user_id`"""
+
+    def load():
+        developers = Developer.objects.filter(id=developer_id)
+        if user_id is not None:
+            developers = developers.filter(user_id=user_id)
+        return developers.exists()
+
+    return developer_cache.get_or_set((developer_id, user_id), load)
+
+
+def app_developer_id(app_id):
+    """Cached developer id owning `app_id`, or None if the app does not exist"""
+    return app_cache.get_or_set(
+        app_id,
+        lambda: App.objects.filter(id=app_id)
+        .values_list("developer_id", flat=True)
+        .first(),
+    )
+
+
+def shared_cache():
+    """Cross-worker cache backing the membership sets, or None if disabled"""
+    alias = settings.AUTHZ_SHARED_CACHE
+    return caches[alias] if alias else None
+
+
+def _version_key(kind, owner_id):
+    return f"authz:{kind}:{owner_id}:version"
+
+
+def membership_version(shared, kind, owner_id):
+    key = _version_key(kind, owner_id)
+    version = shared.get(key)
+    if version is None:
+        # Seed from the clock so a lost or expired version key can never
+        # resurrect membership sets stored under an earlier version. Version
+        # keys expire like any other entry: confirm requests take versions
+        # for whatever ids their headers name.
+        shared.add(key, time.time_ns())
+        version = shared.get(key)
+    return version
+
+
+def bump_membership_version(kind, owner_id):
+    """Invalidates a membership set in every worker sharing the cache"""
+    shared = shared_cache()
+    if shared is None:
+        return
+    key = _version_key(kind, owner_id)
+    try:
+        shared.incr(key)
+    except ValueError:
+        shared.set(key, time.time_ns())
+
+
+def _membership(local, kind, owner_id, load):
+    shared = shared_cache()
+    if shared is None:
+        return local.get_or_set((owner_id, None), load)
+
+    version = membership_version(shared, kind, owner_id)
+    value = local.get((owner_id, version), _MISSING)
+    if value is _MISSING:
+        shared_key = f"authz:{kind}:{owner_id}:{version}"
+        value = shared.get(shared_key)
+        if value is None:
+            value = load()
+            shared.set(shared_key, value)
+        local.set((owner_id, version), value)
+    return value
+
+
+def user_app_ids(user_id):
+    """Ids of the apps `user_id` is registered to"""
+    return _membership(
+        registration_cache,
+        "user_apps",
+        user_id,
+        lambda: frozenset(
+            UserAppRegistration.objects.filter(user_id=user_id).values_list(
+                "app_id", flat=True
+            )
+        ),
+    )
+
+
+def developer_app_ids(developer_id):
+    """Ids of the apps owned by `developer_id`"""
+    return _membership(
+        developer_apps_cache,
+        "developer_apps",
+        developer_id,
+        lambda: frozenset(
+            App.objects.filter(developer_id=developer_id).values_list("id", flat=True)
+        ),
+    )
+
+
+def load_developer_claims(user_id):
+    """Developer profile and app ids of `user_id` in a single joined query"""
+    rows = Developer.objects.filter(user_id=user_id).values_list(
+        "id", "stripe_account_id", "apps__id"
+    )
+    claims = {}
+    for developer_id, stripe_account_id, app_id in rows:
+        claims.setdefault("developer_id", developer_id)
+        claims["stripe_account"] = stripe_account_id
+        claims.setdefault("app_ids", [])
+        if app_id:
+            claims["app_ids"].append(app_id)
+    if claims:
+        claims["app_ids"] = tuple(sorted(claims["app_ids"]))
+    return claims
+
+
+def developer_claims(user_id):
+    """Memoized developer claims minted into `user_id`'s tokens, {} if none"""
+    return _membership(
+        claims_cache, "claims", user_id, lambda: load_developer_claims(user_id)
+    )
+
+
+def current_version(kind, owner_id):
+    """Shared version of a membership set, or None without a shared cache"""
+    shared = shared_cache()
+    return None if shared is None else membership_version(shared, kind, owner_id)
+
+
+def claims_version(user_id):
+    """Version of `user_id`'s developer claims, bumped whenever they change;
+    None without a shared cache"""
+    shared = shared_cache()
+    return None if shared is None else membership_version(shared, "claims", user_id)
+
+
+def _unregistered_key(user_id, app_id):
+    return f"authz:unregistered:{user_id}:{app_id}"
+
+
+def record_unregistration(user_id, app_id):
+    """Logs a deleted registration for the other workers' membership indexes"""
+    shared = shared_cache()
+    if shared is not None:
+        shared.set(
+            _unregistered_key(user_id, app_id),
+            time.time(),
+            timeout=settings.MEMBERSHIP_INDEX["DELETE_LOG_TTL"],
+        )
+
+
+def _index_trusted(deleted_at):
+    """Whether a positive index answer predates no logged deletion of it
+
+    A snapshot older than the log's TTL could miss an expired entry, so
+    it is not trusted either.
+    """
+    loaded_at = membership_index.loaded_at
+    config = settings.MEMBERSHIP_INDEX
+    if loaded_at is None or time.time() - loaded_at > config["DELETE_LOG_TTL"]:
+        return False
+    return deleted_at is None or deleted_at < loaded_at - config["DELTA_OVERLAP"]
+
+
+def _index_registered(user_id, app_id):
+    """Membership index answer, or None to ask the registration cache"""
+    registered = membership_index.contains(user_id, app_id)
+    shared = shared_cache()
+    if not registered or shared is None:
+        return registered
+    deleted_at = shared.get(_unregistered_key(user_id, app_id))
+    return True if _index_trusted(deleted_at) else None
+
+
+def is_registered(user_id, app_id):
+    """Cached check that `user_id` is registered to `app_id`"""
+    if settings.MEMBERSHIP_INDEX["ENABLED"]:
+        registered = _index_registered(user_id, app_id)
+        if registered is not None:
+            return registered
+    return app_id in user_app_ids(user_id)
+
+
+#### Async lookups for the ASGI views ####
+async def auser_exists(user_id):
+    return await user_cache.aget_or_set(
+        user_id, lambda: CustomUser.objects.filter(id=user_id).aexists()
+    )
+
+
+async def adeveloper_exists(developer_id, user_id=None):
+    developers = Developer.objects.filter(id=developer_id)
+    if user_id is not None:
+        developers = developers.filter(user_id=user_id)
+    return await developer_cache.aget_or_set(
+        (developer_id, user_id), developers.aexists
+    )
+
+
+async def aapp_developer_id(app_id):
+    return await app_cache.aget_or_set(
+        app_id,
+        App.objects.filter(id=app_id).values_list("developer_id", flat=True).afirst,
+    )
+
+
+async def amembership_version(shared, kind, owner_id):
+    key = _version_key(kind, owner_id)
+    version = await shared.aget(key)
+    if version is None:
+        await shared.aadd(key, time.time_ns())
+        version = await shared.aget(key)
+    return version
+
+
+async def acurrent_version(kind, owner_id):
+    shared = shared_cache()
+    return None if shared is None else await amembership_version(shared, kind, owner_id)
+
+
+async def _amembership(local, kind, owner_id, aload):
+    shared = shared_cache()
+    if shared is None:
+        return await local.aget_or_set((owner_id, None), aload)
+
+    version = await amembership_version(shared, kind, owner_id)
+    value = local.get((owner_id, version), _MISSING)
+    if value is _MISSING:
+        shared_key = f"authz:{kind}:{owner_id}:{version}"
+        value = await shared.aget(shared_key)
+        if value is None:
+            value = await aload()
+            await shared.aset(shared_key, value)
+        local.set((owner_id, version), value)
+    return value
+
+
+async def auser_app_ids(user_id):
+    async def load():
+        registrations = UserAppRegistration.objects.filter(user_id=user_id)
+        return frozenset(
+            [app_id async for app_id in registrations.values_list("app_id", flat=True)]
+        )
+
+    return await _amembership(registration_cache, "user_apps", user_id, load)
+
+
+async def adeveloper_app_ids(developer_id):
+    async def load():
+        apps = App.objects.filter(developer_id=developer_id)
+        return frozenset([app_id async for app_id in apps.values_list("id", flat=True)])
+
+    return await _amembership(
+        developer_apps_cache, "developer_apps", developer_id, load
+    )
+
+
+async def ais_registered(user_id, app_id):
+    if settings.MEMBERSHIP_INDEX["ENABLED"]:
+        await membership_index.async_sync()
+        registered = membership_index.contains(user_id, app_id)
+        shared = shared_cache()
+        if registered and shared is not None:
+            deleted_at = await shared.aget(_unregistered_key(user_id, app_id))
+            registered = True if _index_trusted(deleted_at) else None
+        if registered is not None:
+            return registered
+    return app_id in await auser_app_ids(user_id)
+
+
+def cache_stats():
+    return [
+        cache.stats()
+        for cache in (
+            user_cache,
+            developer_cache,
+            app_cache,
+            registration_cache,
+            developer_apps_cache,
+            claims_cache,
+            confirm_response_cache,
+        )
+    ]
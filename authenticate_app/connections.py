@@ -0,0 +1,41 @@
+import threading
+import time
+
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+
+_lock = threading.Lock()
+_requests = 0
+_created = {}
+_last_created = {}
+
+
+def record_request(**kwargs):
+    global _requests
+    with _lock:
+        _requests += 1
+
+
+def record_connection(sender, connection, **kwargs):
+    with _lock:
+        _created[connection.alias] = _created.get(connection.alias, 0) + 1
+        _last_created[connection.alias] = time.time()
+
+
+def connect():
+    request_started.connect(record_request, dispatch_uid="connections.request")
+    connection_created.connect(record_connection, dispatch_uid="connections.connection")
+
+
+def connection_stats():
+    """New connections (each one a fresh handshake) against requests served."""
+    with _lock:
+        created = sum(_created.values())
+        reused = max(_requests - created, 0)
+        return {
+            "requests": _requests,
+            "connections_created": dict(_created),
+            "last_created": dict(_last_created),
+            "requests_reusing_connection": reused,
+            "reuse_ratio": reused / _requests if _requests else 0.0,
+        }
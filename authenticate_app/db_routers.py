@@ -0,0 +1,77 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Models whose reads must never lag: a revocation has to apply at once.
+PRIMARY_ONLY = {"authenticate_app.revocation"}
+
+_routing = ContextVar("db_routing", default=None)
+
+
+class RequestRouting:
+    """Where the current request's reads go; shared by the whole request"""
+
+    def __init__(self):
+        self.replica = False
+
+
+def begin_request():
+    """Starts routing for a request; reads go to the primary until allowed"""
+    return _routing.set(RequestRouting())
+
+
+def end_request(token):
+    _routing.reset(token)
+
+
+def current_routing():
+    return _routing.get()
+
+
+def replica_reads(view):
+    """Marks a view that only reads, even if it is called with POST"""
+    view.replica_reads = True
+    return view
+
+
+def replica_aliases():
+    return settings.READ_REPLICAS["ALIASES"]
+
+
+class ReplicaRouter:
+    """Sends reads of replica-safe requests to a replica, everything else to
+    the primary. Code outside a request (commands, signals) always reads
+    from the primary."""
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        aliases = replica_aliases()
+        if (
+            routing is None
+            or not routing.replica
+            or not aliases
+            or model._meta.label_lower in PRIMARY_ONLY
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            # Read our own write for the rest of the request.
+            routing.replica = False
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas mirror the primary, so rows from any of them can relate.
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replica_aliases():
+            return False
+        return None
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+
+from .instrumentation import timed
+
+cost = settings.PASSWORD_HASH_COST
+
+
+class TimedHasherMixin:
+    """Counts hashing done on the request thread in the request's timings"""
+
+    def encode(self, *args, **kwargs):
+        with timed("hash"):
+            return super().encode(*args, **kwargs)
+
+    def verify(self, *args, **kwargs):
+        with timed("hash"):
+            return super().verify(*args, **kwargs)
+
+
+class TunedPBKDF2PasswordHasher(TimedHasherMixin, PBKDF2PasswordHasher):
+    iterations = cost["PBKDF2_ITERATIONS"]
+
+
+class TunedScryptPasswordHasher(TimedHasherMixin, ScryptPasswordHasher):
+    work_factor = cost["SCRYPT_WORK_FACTOR"]
+
+
+class TunedArgon2PasswordHasher(TimedHasherMixin, Argon2PasswordHasher):
+    """Needs the optional argon2-cffi package"""
+
+    time_cost = cost["ARGON2_TIME_COST"]
+    memory_cost = cost["ARGON2_MEMORY_COST"]
+    parallelism = cost["ARGON2_PARALLELISM"]
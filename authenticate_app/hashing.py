@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.signals import user_login_failed
+
+from .instrumentation import timed
+from .models import CustomUser
+
+
+class HashingPoolSaturated(Exception):
+    """Raised when the hashing pool has no free worker or queue slot"""
+
+
+class HashingPool:
+    """Size-limited thread pool for password hashing with admission control
+
+    At most `workers` hashes run at once and `max_queue` more may wait;
+    anything beyond that is rejected immediately so logins shed load instead
+    of piling up behind the CPU.
+    """
+
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hashing"
+        )
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_seconds = 0.0
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingPoolSaturated()
+        with self._lock:
+            self.pending += 1
+        return self.executor.submit(self._run, time.perf_counter(), fn, *args)
+
+    def _run(self, enqueued_at, fn, *args):
+        with self._lock:
+            self.pending -= 1
+            self.active += 1
+            self.queue_wait_seconds += time.perf_counter() - enqueued_at
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+            self._slots.release()
+
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    async def arun(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self):
+        started = self.completed + self.active
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.pending,
+            "utilization": self.active / self.workers,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "queue_wait_seconds": self.queue_wait_seconds,
+            "average_queue_wait_seconds": (
+                self.queue_wait_seconds / started if started else 0.0
+            ),
+        }
+
+
+hashing_pool = HashingPool(
+    settings.PASSWORD_HASHING["WORKERS"], settings.PASSWORD_HASHING["MAX_QUEUE"]
+)
+
+
+def verify_password(user, password):
+    """CPU-only half of ModelBackend.authenticate, safe to run off-thread
+
+    Returns whether the login succeeds and, when the stored hash was made
+    with an outdated hasher or cost, a replacement hash for the caller to save.
+    """
+    if user is None:
+        # Run the hasher anyway so unknown usernames take as long as known ones.
+        CustomUser().set_password(password)
+        return False, None
+    is_correct, must_update = hashers.verify_password(password, user.password)
+    upgraded = hashers.make_password(password) if is_correct and must_update else None
+    return is_correct and user.is_active, upgraded
+
+
+def login_failed(username, request):
+    """user_login_failed arguments, with the password masked as Django does"""
+    return {
+        "sender": __name__,
+        "credentials": {"username": username, "password": "*" * 20},
+        "request": request,
+    }
+
+
+def pooled_authenticate(username, password, request=None):
+    """Authenticates with the password hashed on the bounded hashing pool
+
+    Stands in for `authenticate()` with ModelBackend alone: other
+    AUTHENTICATION_BACKENDS are not consulted, but a failed login still
+    sends user_login_failed. Raises HashingPoolSaturated when the pool is
+    full.
+    """
+    if username is None or password is None:
+        user_login_failed.send(**login_failed(username, request))
+        return None
+    user = CustomUser._default_manager.filter(
+        **{CustomUser.USERNAME_FIELD: username}
+    ).first()
+    with timed("hash"):
+        verified, upgraded = hashing_pool.run(verify_password, user, password)
+    if upgraded:
+        user.password = upgraded
+        user.save(update_fields=["password"])
+    if not verified:
+        user_login_failed.send(**login_failed(username, request))
+        return None
+    return user
+
+
+async def aauthenticate(username, password, request=None):
+    """Async pooled_authenticate, fetching the user with the async ORM"""
+    if username is None or password is None:
+        await user_login_failed.asend(**login_failed(username, request))
+        return None
+    user = await CustomUser._default_manager.filter(
+        **{CustomUser.USERNAME_FIELD: username}
+    ).afirst()
+    with timed("hash"):
+        verified, upgraded = await hashing_pool.arun(verify_password, user, password)
+    if upgraded:
+        user.password = upgraded
+        await user.asave(update_fields=["password"])
+    if not verified:
+        await user_login_failed.asend(**login_failed(username, request))
+        return None
+    return user
@@ -0,0 +1,280 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+
+PHASES = ("db", "jwt", "sign", "hash")
+
+SECONDS_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_timings = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Time spent per phase (db, jwt, sign, hash) during one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.seconds = defaultdict(float)
+        self.queries = 0
+        self._active = set()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def begin_request():
+    return _timings.set(RequestTimings())
+
+
+def end_request(token):
+    _timings.reset(token)
+
+
+def current_timings():
+    return _timings.get()
+
+
+@contextmanager
+def timed(phase):
+    """Adds the block's duration to `phase` of the current request.
+
+    Does nothing outside a request (or in worker threads, which do not
+    inherit the request context), and nested blocks of the same phase
+    count once.
+    """
+    timings = _timings.get()
+    if timings is None or phase in timings._active:
+        yield
+        return
+    timings._active.add(phase)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.seconds[phase] += time.perf_counter() - started
+        timings._active.discard(phase)
+
+
+def count_query(execute, sql, params, many, context):
+    """Connection execute_wrapper timing every query of the request"""
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    timings.queries += 1
+    with timed("db"):
+        return execute(sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    # Installed on the connection itself rather than around the request:
+    # async views run their queries on another thread's connection.
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+def connect():
+    connection_created.connect(
+        install_query_counter, dispatch_uid="instrumentation.queries"
+    )
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram keyed by label values"""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0, 0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            base = ",".join(
+                f'{name}="{value}"' for name, value in zip(self.label_names, labels)
+            )
+            prefix = f"{base}," if base else ""
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {values[-2]}')
+            lines.append(f"{self.name}_count{{{base}}} {values[-2]}")
+            lines.append(f"{self.name}_sum{{{base}}} {values[-1]}")
+        return lines
+
+
+request_seconds = Histogram(
+    "authz_request_duration_seconds",
+    "Request duration by view",
+    ("view",),
+    SECONDS_BUCKETS,
+)
+phase_seconds = Histogram(
+    "authz_request_phase_seconds",
+    "Time spent per request in db, jwt, sign and hash, by view",
+    ("view", "phase"),
+    SECONDS_BUCKETS,
+)
+request_queries = Histogram(
+    "authz_request_db_queries",
+    "Database queries per request by view",
+    ("view",),
+    QUERY_BUCKETS,
+)
+
+
+def observe(view, timings, elapsed):
+    request_seconds.observe((view,), elapsed)
+    request_queries.observe((view,), timings.queries)
+    for phase in PHASES:
+        phase_seconds.observe((view, phase), timings.seconds.get(phase, 0.0))
+
+
+def server_timing(timings, elapsed):
+    """Server-Timing header value for a finished request"""
+    entries = [
+        f'db;dur={timings.seconds["db"] * 1000:.2f};desc="{timings.queries} queries"'
+    ]
+    for phase in PHASES[1:]:
+        if phase in timings.seconds:
+            entries.append(f"{phase};dur={timings.seconds[phase] * 1000:.2f}")
+    entries.append(f"total;dur={elapsed * 1000:.2f}")
+    return ", ".join(entries)
+
+
+def _stat_lines(name, help_text, kind, samples):
+    if kind == "counter":
+        name = f"{name}_total"
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        rendered = ",".join(f'{key}="{label}"' for key, label in labels.items())
+        lines.append(f"{name}{{{rendered}}} {value}" if rendered else f"{name} {value}")
+    return lines
+
+
+def render_metrics():
+    """Text exposition of the request histograms and the existing stats"""
+    from .cache import cache_stats
+    from .connections import connection_stats
+    from .hashing import hashing_pool
+    from .membership import membership_index
+    from .tokens import token_cache_stats
+
+    lines = []
+    for histogram in (request_seconds, phase_seconds, request_queries):
+        lines.extend(histogram.render())
+
+    caches = cache_stats() + [token_cache_stats()]
+    for stat, kind in (
+        ("hits", "counter"),
+        ("misses", "counter"),
+        ("evictions", "counter"),
+        ("size", "gauge"),
+    ):
+        lines.extend(
+            _stat_lines(
+                f"authz_cache_{stat}",
+                f"Lookup cache {stat}",
+                kind,
+                [({"cache": cache["name"]}, cache[stat]) for cache in caches],
+            )
+        )
+    tokens = token_cache_stats()
+    lines.extend(
+        _stat_lines(
+            "authz_token_decodes",
+            "JWT signature verifications that missed the token cache",
+            "counter",
+            [({}, tokens["decodes"])],
+        )
+    )
+
+    pool = hashing_pool.stats()
+    for stat, kind in (
+        ("active", "gauge"),
+        ("queued", "gauge"),
+        ("completed", "counter"),
+        ("rejected", "counter"),
+        ("queue_wait_seconds", "counter"),
+    ):
+        lines.extend(
+            _stat_lines(
+                f"authz_hashing_pool_{stat}",
+                f"Password hashing pool {stat.replace('_', ' ')}",
+                kind,
+                [({}, pool[stat])],
+            )
+        )
+
+    db = connection_stats()
+    lines.extend(
+        _stat_lines(
+            "authz_db_connections_created",
+            "New database connections, each a fresh handshake",
+            "counter",
+            [
+                ({"alias": alias}, count)
+                for alias, count in db["connections_created"].items()
+            ],
+        )
+    )
+    lines.extend(
+        _stat_lines(
+            "authz_db_connection_reuse_ratio",
+            "Share of requests served without opening a connection",
+            "gauge",
+            [({}, db["reuse_ratio"])],
+        )
+    )
+
+    index = membership_index.stats()
+    for stat, help_text in (
+        ("registrations", "Registrations held by the in-memory membership index"),
+        ("total_bytes", "Approximate memory used by the membership index"),
+    ):
+        lines.extend(
+            _stat_lines(
+                f"authz_membership_index_{stat}",
+                help_text,
+                "gauge",
+                [({}, index[stat])],
+            )
+        )
+    return "\n".join(lines) + "\n"
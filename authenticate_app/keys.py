@@ -0,0 +1,57 @@
+import functools
+import hashlib
+import json
+from pathlib import Path
+
+import jwt
+from django.conf import settings
+
+ASYMMETRIC_ALGORITHMS = (
+    "RS256",
+    "RS384",
+    "RS512",
+    "PS256",
+    "PS384",
+    "PS512",
+    "ES256",
+    "ES384",
+    "ES512",
+    "EdDSA",
+)
+
+
+def is_asymmetric():
+    return settings.SIMPLE_JWT["ALGORITHM"] in ASYMMETRIC_ALGORITHMS
+
+
+@functools.lru_cache(maxsize=None)
+def verifying_keys():
+    """Public keys by kid, read from `<JWT_KEYS_DIR>/<kid>.pub` files
+
+    Keeping retired public keys in the directory lets tokens signed before a
+    rotation verify until they expire.
+    """
+    if not is_asymmetric() or not settings.JWT_KEYS_DIR:
+        return {}
+    return {
+        path.name[: -len(".pub")]: path.read_text()
+        for path in sorted(Path(settings.JWT_KEYS_DIR).glob("*.pub"))
+    }
+
+
+def signing_kid():
+    return settings.JWT_SIGNING_KID if is_asymmetric() else None
+
+
+@functools.lru_cache(maxsize=None)
+def jwks():
+    """JSON Web Key Set of the public keys, with its encoded body and ETag"""
+    algorithm = settings.SIMPLE_JWT["ALGORITHM"]
+    keys = []
+    for kid, pem in verifying_keys().items():
+        signer = jwt.get_algorithm_by_name(algorithm)
+        key = signer.to_jwk(signer.prepare_key(pem), as_dict=True)
+        key.update({"kid": kid, "use": "sig", "alg": algorithm})
+        keys.append(key)
+    body = json.dumps({"keys": keys}, sort_keys=True, separators=(",", ":")).encode()
+    return body, f'"{hashlib.sha256(body).hexdigest()}"'
@@ -0,0 +1,106 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from nanoid import generate
+
+from authenticate_app.models import App, CustomUser, Developer, UserAppRegistration
+from authenticate_app.tokens import CustomRefreshToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares confirm requests per second through the fast-path "
+        "middleware against the full middleware stack and DRF views"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seconds",
+            type=float,
+            default=3.0,
+            help="How long to hammer each path",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=4,
+            help="Concurrent clients",
+        )
+
+    def handle(self, *args, **options):
+        users = self.seed()
+        try:
+            requests = self.confirm_requests(*users)
+            self.stdout.write(
+                f"{'path':<10}{'requests/s':>12}{'mean ms':>12}  "
+                f"({options['threads']} threads, {options['seconds']}s each)"
+            )
+            results = {}
+            for name, enabled in (("drf", False), ("fast", True)):
+                config = {**settings.CONFIRM_FAST_PATH, "ENABLED": enabled}
+                with override_settings(CONFIRM_FAST_PATH=config):
+                    rate, mean = self.measure(
+                        requests, options["threads"], options["seconds"]
+                    )
+                results[name] = rate
+                self.stdout.write(f"{name:<10}{rate:>12.1f}{mean * 1000:>12.2f}")
+            if results["drf"]:
+                self.stdout.write(f"speedup: {results['fast'] / results['drf']:.2f}x")
+        finally:
+            CustomUser.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def seed(self):
+        # Committed so the client threads' connections can see the rows.
+        suffix = generate(size=8)
+        owner = CustomUser.objects.create_user(username=f"bench-dev-{suffix}")
+        member = CustomUser.objects.create_user(username=f"bench-user-{suffix}")
+        developer = Developer.objects.create(user=owner, company_name="bench")
+        app = App.objects.create(name="bench", developer=developer)
+        UserAppRegistration.objects.create(user=member, app=app)
+        return owner, member
+
+    def confirm_requests(self, owner, member):
+        app_id = owner.developer_profile.apps.get().id
+
+        def bearer(user):
+            return "Bearer " + str(CustomRefreshToken.for_user(user).access_token)
+
+        return [
+            (
+                "/api/v1/confirm/developer/",
+                {"app_id": app_id},
+                {"HTTP_AUTHORIZATION": bearer(owner)},
+            ),
+            (
+                "/api/v1/confirm/user/",
+                {"app_id": app_id},
+                {"HTTP_AUTHORIZATION": bearer(member)},
+            ),
+        ]
+
+    def measure(self, requests, threads, seconds):
+        deadline = time.perf_counter() + seconds
+
+        def worker():
+            client = Client()
+            count, busy = 0, 0.0
+            while time.perf_counter() < deadline:
+                path, params, headers = requests[count % len(requests)]
+                started = time.perf_counter()
+                response = client.get(path, params, **headers)
+                busy += time.perf_counter() - started
+                if response.status_code != 200:
+                    raise RuntimeError(f"{path} answered {response.status_code}")
+                count += 1
+            return count, busy
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(lambda _: worker(), range(threads)))
+        elapsed = time.perf_counter() - started
+        count = sum(result[0] for result in results)
+        busy = sum(result[1] for result in results)
+        return count / elapsed, busy / count if count else 0.0
@@ -0,0 +1,72 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = "Measures password verifications per second for each hasher profile"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "profiles",
+            nargs="*",
+            help="Profiles from PASSWORD_HASH_PROFILES (default: all)",
+        )
+        parser.add_argument(
+            "--seconds",
+            type=float,
+            default=3.0,
+            help="How long to hammer each profile",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=settings.PASSWORD_HASHING["WORKERS"],
+            help="Concurrent verifications, matching the login hashing pool",
+        )
+
+    def handle(self, *args, **options):
+        profiles = options["profiles"] or list(settings.PASSWORD_HASH_PROFILES)
+        unknown = set(profiles) - set(settings.PASSWORD_HASH_PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(
+            f"{'profile':<10}{'logins/s':>12}{'mean ms':>12}  "
+            f"({options['threads']} threads, {options['seconds']}s each)"
+        )
+        for profile in profiles:
+            hasher = import_string(settings.PASSWORD_HASH_PROFILES[profile])()
+            try:
+                encoded = hasher.encode("benchmark-password", hasher.salt())
+            except ValueError as exc:
+                self.stdout.write(f"{profile:<10}  skipped: {exc}")
+                continue
+            rate, mean = self.measure(
+                hasher, encoded, options["threads"], options["seconds"]
+            )
+            marker = " *" if profile == settings.PASSWORD_HASH_PROFILE else ""
+            self.stdout.write(f"{profile:<10}{rate:>12.1f}{mean * 1000:>12.1f}{marker}")
+
+    def measure(self, hasher, encoded, threads, seconds):
+        deadline = time.perf_counter() + seconds
+
+        def worker():
+            count, busy = 0, 0.0
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                hasher.verify("benchmark-password", encoded)
+                busy += time.perf_counter() - started
+                count += 1
+            return count, busy
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(lambda _: worker(), range(threads)))
+        elapsed = time.perf_counter() - started
+        count = sum(result[0] for result in results)
+        busy = sum(result[1] for result in results)
+        return count / elapsed, busy / count if count else 0.0
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from nanoid import generate
+from rest_framework_simplejwt.backends import TokenBackend
+
+from authenticate_app.models import generate_unique_app_id
+from authenticate_app.tokens import CustomRefreshToken, token_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares Authorization header size and uncached decode time of "
+        "access tokens with inline app_ids against compact ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "app_counts",
+            nargs="*",
+            type=int,
+            default=[0, 10, 20, 50, 100, 500, 1000],
+            help="Numbers of apps to mint tokens for",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=2000,
+            help="Decodes timed per token",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'apps':>6}{'inline B':>10}{'compact B':>11}"
+            f"{'inline us':>11}{'compact us':>12}"
+        )
+        for count in options["app_counts"]:
+            claims = {
+                "developer_id": f"de_{generate(size=25)}",
+                "stripe_account": None,
+                "app_ids": tuple(
+                    sorted(generate_unique_app_id() for _ in range(count))
+                ),
+            }
+            inline = self.access_token(claims, max_inline=count)
+            compact = self.access_token(claims, max_inline=-1)
+            self.stdout.write(
+                f"{count:>6}{len(self.header(inline)):>10}"
+                f"{len(self.header(compact)):>11}"
+                f"{self.decode_micros(inline, options['iterations']):>11.1f}"
+                f"{self.decode_micros(compact, options['iterations']):>12.1f}"
+            )
+
+    def access_token(self, claims, max_inline):
+        refresh = CustomRefreshToken()
+        refresh["user_id"] = f"usr_{generate(size=25)}"
+        with override_settings(TOKEN_APP_IDS={"MAX_INLINE": max_inline}):
+            refresh.apply_developer_claims(claims)
+        return str(refresh.access_token)
+
+    def header(self, token):
+        return f"Authorization: Bearer {token}".encode()
+
+    def decode_micros(self, token, iterations):
+        # Bypasses the decoded-token cache: this is the cost of a miss.
+        decode = TokenBackend.decode
+        started = time.perf_counter()
+        for _ in range(iterations):
+            decode(token_backend, token)
+        return (time.perf_counter() - started) / iterations * 1e6
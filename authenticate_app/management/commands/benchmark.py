@@ -0,0 +1,350 @@
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from nanoid import generate
+
+from authenticate_app.models import App, CustomUser, Developer, UserAppRegistration
+from authenticate_app.tokens import CustomRefreshToken
+
+PASSWORD = "benchmark-password"
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmarks" / "baseline.json"
+
+
+class Dataset:
+    """Seeded rows plus tokens minted up front, so requests only measure
+    the endpoint under test"""
+
+    def __init__(self, users, developers, apps, registrations):
+        self.users = users
+        self.developers = developers
+        self.apps = apps
+        self.registrations = registrations
+        self.tokens = {}
+        for user in users:
+            refresh = CustomRefreshToken.for_user(user)
+            self.tokens[user.pk] = (str(refresh.access_token), str(refresh))
+
+    def bearer(self, user):
+        return {"HTTP_AUTHORIZATION": f"Bearer {self.tokens[user.pk][0]}"}
+
+    def developer_app(self, rng):
+        developer = rng.choice(self.developers)
+        return developer, rng.choice(self.apps[developer.pk])
+
+    def registration(self, rng):
+        return rng.choice(self.registrations)
+
+
+def login(client, data, rng):
+    user = rng.choice(data.users)
+    return client.post(
+        "/api/v1/login/", {"username": user.username, "password": PASSWORD}
+    )
+
+
+def token(client, data, rng):
+    user = rng.choice(data.users)
+    return client.post(
+        "/api/v1/token/", {"username": user.username, "password": PASSWORD}
+    )
+
+
+def token_refresh(client, data, rng):
+    user = rng.choice(data.users)
+    return client.post("/api/v1/token/refresh/", {"refresh": data.tokens[user.pk][1]})
+
+
+def confirm_developer(client, data, rng):
+    developer, app_id = data.developer_app(rng)
+    return client.get(
+        "/api/v1/confirm/developer/",
+        {"app_id": app_id},
+        **data.bearer(developer.user),
+    )
+
+
+def confirm_user(client, data, rng):
+    user, app_id = data.registration(rng)
+    return client.get("/api/v1/confirm/user/", {"app_id": app_id}, **data.bearer(user))
+
+
+def list_apps(client, data, rng):
+    developer, _ = data.developer_app(rng)
+    return client.get("/api/v1/apps/", **data.bearer(developer.user))
+
+
+def retrieve_app(client, data, rng):
+    developer, app_id = data.developer_app(rng)
+    return client.get(f"/api/v1/apps/{app_id}/", **data.bearer(developer.user))
+
+
+def list_developers(client, data, rng):
+    developer, _ = data.developer_app(rng)
+    return client.get("/api/v1/developers/", **data.bearer(developer.user))
+
+
+def list_registrations(client, data, rng):
+    user, _ = data.registration(rng)
+    return client.get("/api/v1/registrations/", **data.bearer(user))
+
+
+SCENARIOS = {
+    scenario.__name__: scenario
+    for scenario in (
+        login,
+        token,
+        token_refresh,
+        confirm_developer,
+        confirm_user,
+        list_apps,
+        retrieve_app,
+        list_developers,
+        list_registrations,
+    )
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds users, developers, apps and registrations, drives the login, "
+        "token, confirm and list endpoints with concurrent clients and "
+        "reports throughput, latency percentiles and queries per request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios",
+            nargs="*",
+            help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})",
+        )
+        parser.add_argument("--users", type=int, default=200)
+        parser.add_argument("--developers", type=int, default=20)
+        parser.add_argument("--apps-per-developer", type=int, default=5)
+        parser.add_argument("--registrations-per-user", type=int, default=3)
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Requests per scenario",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="Concurrent clients",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Seed for choosing users and apps, for repeatable runs",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=str(DEFAULT_BASELINE),
+            help="Baseline JSON to compare against",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Store this run as the baseline",
+        )
+        parser.add_argument(
+            "--max-regression",
+            type=float,
+            help="Fail if any scenario's throughput drops more than this percent",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Keep the seeded rows instead of deleting them afterwards",
+        )
+
+    def handle(self, *args, **options):
+        names = options["scenarios"] or list(SCENARIOS)
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        if options["developers"] > options["users"]:
+            raise CommandError("--developers cannot exceed --users")
+
+        data = self.seed(options)
+        try:
+            results = {
+                name: self.run(
+                    SCENARIOS[name],
+                    data,
+                    options["requests"],
+                    options["concurrency"],
+                    options["seed"],
+                )
+                for name in names
+            }
+        finally:
+            if not options["keep"]:
+                CustomUser.objects.filter(
+                    pk__in=[user.pk for user in data.users]
+                ).delete()
+
+        self.report(results, options)
+        baseline = Path(options["baseline"])
+        if options["save_baseline"]:
+            baseline.parent.mkdir(parents=True, exist_ok=True)
+            baseline.write_text(json.dumps(results, indent=2, sort_keys=True))
+            self.stdout.write(f"Saved baseline to {baseline}")
+        elif baseline.exists():
+            self.compare(results, json.loads(baseline.read_text()), options)
+
+    def seed(self, options):
+        prefix = f"bench-{generate(size=8)}"
+        # Hash once: seeding must not be dominated by the password hasher.
+        password = make_password(PASSWORD)
+        users = CustomUser.objects.bulk_create(
+            CustomUser(username=f"{prefix}-{index}", password=password)
+            for index in range(options["users"])
+        )
+        developers = Developer.objects.bulk_create(
+            Developer(user=user, company_name=prefix)
+            for user in users[: options["developers"]]
+        )
+        apps = App.objects.bulk_create(
+            App(name=f"{prefix}-{index}", developer=developer)
+            for developer in developers
+            for index in range(options["apps_per_developer"])
+        )
+        rng = random.Random(options["seed"])
+        per_user = min(options["registrations_per_user"], len(apps))
+        registrations = UserAppRegistration.objects.bulk_create(
+            UserAppRegistration(user=user, app=app)
+            for user in users
+            for app in rng.sample(apps, per_user)
+        )
+
+        apps_by_developer = {}
+        for app in apps:
+            apps_by_developer.setdefault(app.developer_id, []).append(app.id)
+        users_by_id = {user.pk: user for user in users}
+        for developer in developers:
+            developer.user = users_by_id[developer.user_id]
+        self.stdout.write(
+            f"Seeded {len(users)} users, {len(developers)} developers, "
+            f"{len(apps)} apps, {len(registrations)} registrations"
+        )
+        return Dataset(
+            users,
+            developers,
+            apps_by_developer,
+            [
+                (users_by_id[registration.user_id], registration.app_id)
+                for registration in registrations
+            ],
+        )
+
+    def run(self, scenario, data, requests, concurrency, seed):
+        lock = threading.Lock()
+        remaining = iter(range(requests))
+        latencies, queries, errors = [], [], {}
+
+        def next_index():
+            with lock:
+                return next(remaining, None)
+
+        def worker():
+            client = Client()
+            counted = [0]
+
+            def count(execute, sql, params, many, context):
+                counted[0] += 1
+                return execute(sql, params, many, context)
+
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(count))
+                while (index := next_index()) is not None:
+                    counted[0] = 0
+                    started = time.perf_counter()
+                    response = scenario(client, data, random.Random(seed + index))
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        queries.append(counted[0])
+                        if response.status_code >= 400:
+                            errors[response.status_code] = (
+                                errors.get(response.status_code, 0) + 1
+                            )
+            connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(worker) for _ in range(concurrency)]:
+                future.result()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            "requests": len(latencies),
+            "throughput": len(latencies) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "queries_per_request": statistics.fmean(queries) if queries else 0.0,
+            "errors": {str(code): count for code, count in sorted(errors.items())},
+        }
+
+    def report(self, results, options):
+        self.stdout.write(
+            f"{'scenario':<20}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'p99 ms':>10}{'q/req':>8}  errors  "
+            f"({options['concurrency']} clients, {options['requests']} requests)"
+        )
+        for name, result in results.items():
+            errors = ", ".join(f"{code}x{n}" for code, n in result["errors"].items())
+            self.stdout.write(
+                f"{name:<20}{result['throughput']:>10.1f}{result['p50_ms']:>10.2f}"
+                f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                f"{result['queries_per_request']:>8.2f}  {errors or '-'}"
+            )
+
+    def compare(self, results, baseline, options):
+        self.stdout.write(f"\n{'vs baseline':<20}{'req/s':>10}{'p95':>10}{'q/req':>8}")
+        regressions = []
+        for name, result in results.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            throughput = _change(before["throughput"], result["throughput"])
+            p95 = _change(before["p95_ms"], result["p95_ms"])
+            queries = result["queries_per_request"] - before["queries_per_request"]
+            self.stdout.write(
+                f"{name:<20}{throughput:>+9.1f}%{p95:>+9.1f}%{queries:>+8.2f}"
+            )
+            limit = options["max_regression"]
+            if limit is not None and throughput < -limit:
+                regressions.append(name)
+        if regressions:
+            raise CommandError(
+                f"Throughput regressed beyond {options['max_regression']}% in: "
+                f"{', '.join(regressions)}"
+            )
+
+
+def _change(before, after):
+    return (after - before) / before * 100 if before else 0.0
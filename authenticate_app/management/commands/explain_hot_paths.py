@@ -0,0 +1,94 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from authenticate_app.models import App, CustomUser, Developer, UserAppRegistration
+
+USER_ID = "usr_" + "x" * 25
+DEVELOPER_ID = "de_" + "x" * 25
+APP_ID = "ap_" + "x" * 25
+
+
+def hot_path_queries():
+    """The lookups behind confirm, permissions and token claims."""
+    return {
+        "user_exists": CustomUser.objects.filter(id=USER_ID).values("id"),
+        "developer_exists": Developer.objects.filter(
+            id=DEVELOPER_ID, user_id=USER_ID
+        ).values("id"),
+        "developer_claims": Developer.objects.filter(user_id=USER_ID).values_list(
+            "id", "stripe_account_id", "apps__id"
+        ),
+        "app_developer_id": App.objects.filter(id=APP_ID).values_list("developer_id"),
+        "developer_app_ids": App.objects.filter(developer_id=DEVELOPER_ID).values_list(
+            "id"
+        ),
+        "user_app_ids": UserAppRegistration.objects.filter(user_id=USER_ID).values_list(
+            "app_id"
+        ),
+        "app_user_ids": UserAppRegistration.objects.filter(app_id=APP_ID).values_list(
+            "user_id"
+        ),
+        "is_registered": UserAppRegistration.objects.filter(
+            user_id=USER_ID, app_id=APP_ID
+        ).values("id"),
+    }
+
+
+def full_scans(plan):
+    """Returns the plan lines that read a whole table."""
+    vendor = connection.vendor
+    if vendor == "sqlite":
+        # "SCAN t USING COVERING INDEX" still walks every entry.
+        return [line for line in plan.splitlines() if " SCAN " in f" {line} "]
+    if vendor == "postgresql":
+        return [line for line in plan.splitlines() if "Seq Scan" in line]
+    if vendor == "mysql":
+        scans = []
+
+        def walk(node):
+            if isinstance(node, dict):
+                if node.get("access_type") == "ALL":
+                    scans.append(f"full scan of {node.get('table_name')}")
+                for value in node.values():
+                    walk(value)
+            elif isinstance(node, list):
+                for value in node:
+                    walk(value)
+
+        walk(json.loads(plan))
+        return scans
+    raise CommandError(f"No plan check for the {vendor} backend")
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN on the confirm and permission lookups and fails "
+        "if any of them reads a whole table"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print every plan, not just the failing ones",
+        )
+
+    def handle(self, *args, **options):
+        explain_options = {"format": "json"} if connection.vendor == "mysql" else {}
+        failures = []
+        for name, queryset in hot_path_queries().items():
+            plan = queryset.explain(**explain_options)
+            scans = full_scans(plan)
+            if scans:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"{name}: full scan"))
+                self.stdout.write(plan)
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{name}: ok"))
+                if options["verbose_plans"]:
+                    self.stdout.write(plan)
+
+        if failures:
+            raise CommandError(f"Full scans in: {', '.join(failures)}")
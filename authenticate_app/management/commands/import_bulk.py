@@ -0,0 +1,42 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from authenticate_app.bulk import import_registrations, import_users
+
+IMPORTERS = {"users": import_users, "registrations": import_registrations}
+
+
+def read_rows(path):
+    """Yields rows from a .csv, .ndjson/.jsonl or .json (list) file"""
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(handle)
+        elif path.endswith((".ndjson", ".jsonl")):
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(handle)
+
+
+class Command(BaseCommand):
+    help = "Bulk imports users or user-app registrations from a file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(IMPORTERS))
+        parser.add_argument("path", help="A .csv, .ndjson/.jsonl or .json file")
+
+    def handle(self, *args, **options):
+        try:
+            report = IMPORTERS[options["kind"]](read_rows(options["path"]))
+        except (OSError, ValueError) as exc:
+            raise CommandError(exc)
+
+        for error in report["errors"]:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(
+            f"Created {report['created']}, skipped {report['skipped']} existing, "
+            f"{len(report['errors'])} rejected"
+        )
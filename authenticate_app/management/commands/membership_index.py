@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from authenticate_app.cache import user_app_ids
+from authenticate_app.membership import MembershipIndex
+from authenticate_app.models import UserAppRegistration
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads the in-memory membership index and reports its size, memory "
+        "footprint and lookup time against the registration cache"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lookups",
+            type=int,
+            default=10000,
+            help="Membership checks timed against each path",
+        )
+
+    def handle(self, *args, **options):
+        index = MembershipIndex()
+        started = time.perf_counter()
+        index.reload()
+        loaded_in = time.perf_counter() - started
+
+        stats = index.stats()
+        if stats["overflowed"]:
+            self.stdout.write(
+                f"More than {stats['max_registrations']} registrations: "
+                "the index stays unloaded and the lookup caches are used"
+            )
+            return
+        registrations = stats["registrations"]
+        self.stdout.write(
+            f"{registrations} registrations, {stats['apps']} apps, "
+            f"{stats['interned_ids']} interned ids, loaded in {loaded_in:.2f}s"
+        )
+        self.stdout.write(
+            f"memory: {stats['total_bytes'] / 1024:.1f} KiB "
+            f"(arrays {stats['array_bytes'] / 1024:.1f} KiB, "
+            f"ids {stats['id_bytes'] / 1024:.1f} KiB), "
+            f"{stats['total_bytes'] / max(registrations, 1):.1f} B per registration"
+        )
+
+        pairs = list(
+            UserAppRegistration.objects.values_list("user_id", "app_id")[
+                : options["lookups"]
+            ]
+        )
+        if not pairs:
+            return
+        for name, check in (
+            ("index", index.contains),
+            ("cache", lambda user_id, app_id: app_id in user_app_ids(user_id)),
+        ):
+            # The first pass warms the caches; the second is timed.
+            for user_id, app_id in pairs:
+                check(user_id, app_id)
+            started = time.perf_counter()
+            for user_id, app_id in pairs:
+                check(user_id, app_id)
+            micros = (time.perf_counter() - started) / len(pairs) * 1e6
+            self.stdout.write(f"{name:<6}{micros:>8.2f} us per check")
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from authenticate_app.models import Revocation
+from authenticate_app.revocation import revoke
+
+
+class Command(BaseCommand):
+    help = "Revokes tokens by jti, user or app, and prunes expired revocations"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jti", help="Revoke the token with this jti")
+        parser.add_argument(
+            "--user", help="Revoke every token issued to this user id so far"
+        )
+        parser.add_argument(
+            "--app",
+            help="Revoke every token issued for this app id so far, including "
+            "its developer's tokens",
+        )
+        parser.add_argument(
+            "--prune",
+            action="store_true",
+            help="Delete revocations whose tokens have all expired",
+        )
+
+    def handle(self, *args, **options):
+        if not any(options[name] for name in ("jti", "user", "app", "prune")):
+            raise CommandError("Pass --jti, --user, --app or --prune")
+
+        revoke(jti=options["jti"], user_id=options["user"], app_id=options["app"])
+        if options["prune"]:
+            deleted, _ = Revocation.objects.filter(
+                expires_at__lte=timezone.now()
+            ).delete()
+            self.stdout.write(f"Pruned {deleted} expired revocations")
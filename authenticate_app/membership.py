@@ -0,0 +1,218 @@
+import logging
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.db import connections
+from django.db.models import Max
+
+from .models import UserAppRegistration
+from .periodic import PeriodicSync
+
+logger = logging.getLogger(__name__)
+
+
+class MembershipIndex(PeriodicSync):
+    """Per-worker index of user->app registrations
+
+    User and app ids are interned to small integers and each app keeps a
+    sorted array of its users' integers (4 bytes per registration), so a
+    membership check is a dict lookup plus a binary search. Registrations
+    saved or deleted in this worker are applied through signals; rows from
+    other workers (and bulk imports) are pulled by `registration_date`
+    every SYNC_INTERVAL. Every FULL_RELOAD_INTERVAL a background thread
+    rebuilds the index to drop registrations deleted elsewhere, while the
+    current one keeps answering. Past MAX_REGISTRATIONS the index unloads
+    for good and callers fall back to the lookup caches.
+    """
+
+    settings_name = "MEMBERSHIP_INDEX"
+
+    def __init__(self):
+        super().__init__()
+        self._ids = {}
+        self._members = {}
+        self._pending = None
+        self.registrations = 0
+        self.loaded = False
+        self.overflowed = False
+        self.reloading = False
+        self.watermark = None
+        self.loaded_at = None
+
+    def _intern(self, ids, value):
+        number = ids.get(value)
+        if number is None:
+            number = ids[value] = len(ids)
+        return number
+
+    def _insert(self, ids, members, user_id, app_id):
+        users = members.setdefault(self._intern(ids, app_id), array("I"))
+        user = self._intern(ids, user_id)
+        position = bisect_left(users, user)
+        if position < len(users) and users[position] == user:
+            return False
+        users.insert(position, user)
+        return True
+
+    def _full_load(self, config):
+        watermark = UserAppRegistration.objects.aggregate(
+            latest=Max("registration_date")
+        )["latest"]
+        ids, grouped, count = {}, {}, 0
+        # Ordered by (app, user) so the scan stays on registration_app_user_idx.
+        rows = (
+            UserAppRegistration.objects.order_by("app_id", "user_id")
+            .values_list("app_id", "user_id")
+            .iterator(chunk_size=config["CHUNK_SIZE"])
+        )
+        for app_id, user_id in rows:
+            count += 1
+            if count > config["MAX_REGISTRATIONS"]:
+                return None
+            grouped.setdefault(self._intern(ids, app_id), []).append(
+                self._intern(ids, user_id)
+            )
+        members = {app: array("I", sorted(users)) for app, users in grouped.items()}
+        return ids, members, count, watermark
+
+    def _delta_load(self, config):
+        if self.watermark is None:
+            rows = UserAppRegistration.objects.all()
+        else:
+            # The overlap catches rows committed after a later-dated one.
+            since = self.watermark - timedelta(seconds=config["DELTA_OVERLAP"])
+            rows = UserAppRegistration.objects.filter(registration_date__gt=since)
+        rows = list(rows.values_list("app_id", "user_id", "registration_date"))
+        # Queried above without the lock so registration signals never wait.
+        with self._lock:
+            for app_id, user_id, registered_at in rows:
+                self._add(user_id, app_id)
+                if not self.loaded:
+                    return
+                if self.watermark is None or registered_at > self.watermark:
+                    self.watermark = registered_at
+
+    def _publish(self, loaded, loaded_at):
+        self.loaded = loaded is not None
+        self.overflowed = loaded is None
+        if loaded is None:
+            logger.warning(
+                "Membership index disabled: more than %s registrations",
+                self.config["MAX_REGISTRATIONS"],
+            )
+            loaded, loaded_at = ({}, {}, 0, None), None
+        self._ids, self._members, self.registrations, self.watermark = loaded
+        self.loaded_at = loaded_at
+
+    def refresh(self, full):
+        if self.overflowed:
+            # Rescanning would only overflow again; `reload()` retries.
+            return
+        if full and not self.reloading:
+            self.reloading = True
+            threading.Thread(
+                target=self._background_reload,
+                name="membership-index-reload",
+                daemon=True,
+            ).start()
+        elif self.loaded:
+            self._delta_load(self.config)
+
+    def _background_reload(self):
+        try:
+            self.reload()
+        except Exception:
+            logger.exception("Membership index reload failed")
+        finally:
+            connections.close_all()
+
+    def reload(self):
+        """Rebuilds the index from the table in the calling thread
+
+        The current index keeps answering meanwhile; registrations saved or
+        deleted during the scan are replayed onto the new one.
+        """
+        with self._lock:
+            self.reloading = True
+            self._pending = []
+        try:
+            loaded_at = time.time()
+            loaded = self._full_load(self.config)
+            with self._lock:
+                pending, self._pending = self._pending, None
+                self._publish(loaded, loaded_at)
+                for apply, user_id, app_id in pending:
+                    apply(user_id, app_id)
+                self.last_sync = self.last_full_load = time.monotonic()
+                self.synced = True
+        finally:
+            self._pending = None
+            self.reloading = False
+
+    def contains(self, user_id, app_id):
+        """Whether `user_id` is registered to `app_id`, or None if unloaded"""
+        self.sync()
+        if not self.loaded:
+            return None
+        user = self._ids.get(user_id)
+        users = self._members.get(self._ids.get(app_id))
+        if user is None or users is None:
+            return False
+        position = bisect_left(users, user)
+        return position < len(users) and users[position] == user
+
+    def _add(self, user_id, app_id):
+        if self.loaded and self._insert(self._ids, self._members, user_id, app_id):
+            self.registrations += 1
+            if self.registrations > self.config["MAX_REGISTRATIONS"]:
+                self._publish(None, None)
+
+    def _remove(self, user_id, app_id):
+        user = self._ids.get(user_id)
+        users = self._members.get(self._ids.get(app_id))
+        if not self.loaded or user is None or users is None:
+            return
+        position = bisect_left(users, user)
+        if position < len(users) and users[position] == user:
+            del users[position]
+            self.registrations -= 1
+
+    def add(self, user_id, app_id):
+        """Applies a registration saved by this worker without waiting for sync"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((self._add, user_id, app_id))
+            self._add(user_id, app_id)
+
+    def remove(self, user_id, app_id):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((self._remove, user_id, app_id))
+            self._remove(user_id, app_id)
+
+    def stats(self):
+        array_bytes = sum(
+            sys.getsizeof(users) for users in list(self._members.values())
+        )
+        id_bytes = sys.getsizeof(self._ids) + sum(
+            sys.getsizeof(value) for value in list(self._ids)
+        )
+        return {
+            "loaded": self.loaded,
+            "overflowed": self.overflowed,
+            "reloading": self.reloading,
+            "registrations": self.registrations,
+            "apps": len(self._members),
+            "interned_ids": len(self._ids),
+            "array_bytes": array_bytes,
+            "id_bytes": id_bytes,
+            "total_bytes": array_bytes + id_bytes + sys.getsizeof(self._members),
+            "max_registrations": self.config["MAX_REGISTRATIONS"],
+        }
+
+
+membership_index = MembershipIndex()
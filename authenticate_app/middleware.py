@@ -0,0 +1,210 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+
+from . import instrumentation
+from .cache import LRUCache, shared_cache
+from .db_routers import begin_request, current_routing, end_request
+from .tokens import decode_token
+from .async_views import ASYNC_CONFIRMATIONS, aconfirmation_response
+from .views import confirmation_response
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Fallback for recent writers when no shared cache is configured.
+recent_writers = LRUCache("recent_writers", max_size=100000)
+
+
+def _sticky_key(user_id):
+    return f"authz:sticky:{user_id}"
+
+
+def mark_writer(user_id):
+    ttl = settings.READ_REPLICAS["STALENESS_SECONDS"]
+    shared = shared_cache()
+    if shared is not None:
+        shared.set(_sticky_key(user_id), True, ttl)
+    else:
+        recent_writers.set(user_id, True, ttl)
+
+
+def wrote_recently(user_id):
+    shared = shared_cache()
+    if shared is not None:
+        return bool(shared.get(_sticky_key(user_id)))
+    return bool(recent_writers.get(user_id))
+
+
+def request_user_id(request):
+    """The caller's user id from a valid Authorization bearer token"""
+    header = request.headers.get("Authorization", "")
+    if not header.startswith("Bearer "):
+        return None
+    claims = decode_token(header.split("Bearer ")[1])
+    return claims.get("user_id") if claims else None
+
+
+class SyncAndAsyncMiddleware:
+    """Runs as a coroutine when the next handler is one, so the ASGI
+    profile is not adapted through a thread at this middleware"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+def read_from_replica(routing, request):
+    """Sends the request's reads to a replica unless the caller just wrote"""
+    user_id = request_user_id(request)
+    if user_id and wrote_recently(user_id):
+        return
+    routing.replica = True
+
+
+class ReplicaRoutingMiddleware(SyncAndAsyncMiddleware):
+    """Lets read-only requests read from a replica.
+
+    Reads go to a replica for GET/HEAD/OPTIONS and for views marked with
+    `replica_reads`, unless the caller wrote within the staleness window.
+    Successful writes make the caller sticky to the primary for that long.
+    """
+
+    def handle(self, request):
+        token = begin_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        self.mark_sticky(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = begin_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        await sync_to_async(self.mark_sticky)(request, response)
+        return response
+
+    def mark_sticky(self, request, response):
+        if (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+            and settings.READ_REPLICAS["ALIASES"]
+        ):
+            user_id = request_user_id(request)
+            if user_id:
+                mark_writer(user_id)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        routing = current_routing()
+        if routing is None or not settings.READ_REPLICAS["ALIASES"]:
+            return None
+        if request.method not in SAFE_METHODS and not getattr(
+            view_func, "replica_reads", False
+        ):
+            return None
+        read_from_replica(routing, request)
+        return None
+
+
+class ConfirmFastPathMiddleware(SyncAndAsyncMiddleware):
+    """Answers GET confirm requests before the rest of the stack runs.
+
+    Sessions, CSRF, messages, auth and DRF's request wrapping, content
+    negotiation and authentication do nothing for confirm, so the same
+    answer the DRF views give is served from the bare request, as the same
+    pre-encoded bytes. Goes first in MIDDLEWARE.
+    """
+
+    def confirm_kind(self, request):
+        config = settings.CONFIRM_FAST_PATH
+        kind = config["PATHS"].get(request.path_info)
+        if not config["ENABLED"] or request.method != "GET":
+            return None
+        return kind
+
+    def handle(self, request):
+        kind = self.confirm_kind(request)
+        if kind is None:
+            return self.get_response(request)
+
+        token = begin_request()
+        try:
+            if settings.READ_REPLICAS["ALIASES"]:
+                read_from_replica(current_routing(), request)
+            return confirmation_response(kind, request, request.GET.get("app_id"))
+        finally:
+            end_request(token)
+
+    async def __acall__(self, request):
+        kind = self.confirm_kind(request)
+        if kind is None:
+            return await self.get_response(request)
+
+        token = begin_request()
+        try:
+            if settings.READ_REPLICAS["ALIASES"]:
+                await sync_to_async(read_from_replica)(current_routing(), request)
+            return await aconfirmation_response(
+                kind, request, ASYNC_CONFIRMATIONS[kind]
+            )
+        finally:
+            end_request(token)
+
+
+def view_label(request):
+    match = getattr(request, "resolver_match", None)
+    if match is not None:
+        return match.view_name
+    kind = settings.CONFIRM_FAST_PATH["PATHS"].get(request.path_info)
+    return f"confirm_{kind}" if kind else "unmatched"
+
+
+class InstrumentationMiddleware(SyncAndAsyncMiddleware):
+    """Times each request's queries, JWT decoding, signing and hashing.
+
+    The totals go out as a Server-Timing header and into the per-view
+    histograms served on /metrics. Goes first in MIDDLEWARE so the
+    confirm fast path is measured too.
+    """
+
+    def handle(self, request):
+        if not settings.INSTRUMENTATION["ENABLED"]:
+            return self.get_response(request)
+
+        token = instrumentation.begin_request()
+        try:
+            response = self.get_response(request)
+            timings = instrumentation.current_timings()
+        finally:
+            instrumentation.end_request(token)
+        return self.report(request, response, timings)
+
+    async def __acall__(self, request):
+        if not settings.INSTRUMENTATION["ENABLED"]:
+            return await self.get_response(request)
+
+        token = instrumentation.begin_request()
+        try:
+            response = await self.get_response(request)
+            timings = instrumentation.current_timings()
+        finally:
+            instrumentation.end_request(token)
+        return self.report(request, response, timings)
+
+    def report(self, request, response, timings):
+        elapsed = timings.elapsed()
+        instrumentation.observe(view_label(request), timings, elapsed)
+        if settings.INSTRUMENTATION["SERVER_TIMING"]:
+            response["Server-Timing"] = instrumentation.server_timing(timings, elapsed)
+        return response
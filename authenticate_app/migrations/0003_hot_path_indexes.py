@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authenticate_app", "0002_revocation"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="userappregistration",
+            index=models.Index(
+                fields=["app", "user"], name="registration_app_user_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userappregistration",
+            index=models.Index(
+                fields=["registration_date", "id"], name="registration_cursor_idx"
+            ),
+        ),
+    ]
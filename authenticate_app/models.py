@@ -76,6 +76,40 @@ class UserAppRegistration(models.Model):
 
     class Meta:
         unique_together = ("user", "app")
+        indexes = [
+            models.Index(fields=["app", "user"], name="registration_app_user_idx"),
+            models.Index(
+                fields=["registration_date", "id"], name="registration_cursor_idx"
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} registered for {self.app.name}"
+
+
+class Revocation(models.Model):
+    """Revoked tokens: one jti, or every token of a user or app issued before
+    `created_at`. The auto-incrementing id doubles as the sync sequence.
+
+    Compact developer tokens name no apps, so revoking an app also revokes
+    its developer's compact tokens (KIND_COMPACT, keyed by developer id).
+    """
+
+    KIND_JTI = "jti"
+    KIND_USER = "user"
+    KIND_APP = "app"
+    KIND_COMPACT = "compact"
+    KIND_CHOICES = [
+        (KIND_JTI, "Token"),
+        (KIND_USER, "User"),
+        (KIND_APP, "App"),
+        (KIND_COMPACT, "Developer's compact tokens"),
+    ]
+
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    value = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.value} revoked"
@@ -0,0 +1,44 @@
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class IdCursorPagination(CursorPagination):
+    """Keyset pagination over the nanoid primary keys"""
+
+    ordering = ("id",)
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class RegistrationCursorPagination(IdCursorPagination):
+    # The id breaks ties between registrations made in the same instant.
+    ordering = ("registration_date", "id")
+
+
+class StreamingListMixin:
+    """Lets `?stream=ndjson` list every row as newline-delimited JSON
+
+    Rows are read with `.iterator(chunk_size=...)` and serialized one at a
+    time, so exports use constant memory however large the table is.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get("stream") != "ndjson":
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).order_by(
+            *self.pagination_class.ordering
+        )
+        serializer_class = self.get_serializer_class()
+        context = self.get_serializer_context()
+
+        def rows():
+            for instance in queryset.iterator(chunk_size=settings.STREAM_CHUNK_SIZE):
+                data = serializer_class(instance, context=context).data
+                yield json.dumps(data, cls=JSONEncoder) + "\n"
+
+        return StreamingHttpResponse(rows(), content_type="application/x-ndjson")
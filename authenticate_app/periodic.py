@@ -0,0 +1,70 @@
+import asyncio
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+
+def in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class PeriodicSync:
+    """Per-worker snapshot of a table, refreshed at most every SYNC_INTERVAL
+
+    Subclasses name their settings dict in `settings_name` (with
+    SYNC_INTERVAL and FULL_RELOAD_INTERVAL) and implement `refresh(full)`.
+    One thread refreshes while the others keep reading the current
+    snapshot: `refresh()` runs its queries outside `_lock`, which guards
+    the snapshot, and only takes it to swap the results in. What callers
+    see before the first refresh completes is up to the subclass:
+    RevocationList refreshes inline, so they wait for it; MembershipIndex
+    loads on a background thread and reports itself unloaded, so they fall
+    back to the lookup caches. Inside an event loop `sync()` does nothing:
+    async callers await `async_sync()` before reading.
+    """
+
+    settings_name = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.synced = False
+        self.last_sync = -math.inf
+        self.last_full_load = -math.inf
+
+    @property
+    def config(self):
+        return getattr(settings, self.settings_name)
+
+    def due(self, now=None):
+        now = time.monotonic() if now is None else now
+        return not self.synced or now - self.last_sync >= self.config["SYNC_INTERVAL"]
+
+    def refresh(self, full):
+        raise NotImplementedError
+
+    def sync(self, force=False):
+        if in_event_loop() or not (force or self.due()):
+            return
+        with self._sync_lock:
+            now = time.monotonic()
+            if not (force or self.due(now)):
+                return
+            full = now - self.last_full_load >= self.config["FULL_RELOAD_INTERVAL"]
+            # Claimed before refreshing so concurrent callers skip the lock.
+            self.last_sync = now
+            if full:
+                self.last_full_load = now
+            self.refresh(full)
+            self.synced = True
+
+    async def async_sync(self):
+        if self.due():
+            await sync_to_async(self.sync)()
@@ -1,5 +1,30 @@
 from rest_framework.permissions import BasePermission
-from .models import App, Developer
+from .cache import developer_exists
+
+
+class AuthzContext:
+    """The caller's developer record, resolved once per request
+
+    `developer_id` is the token's `developer_id` claim once it is confirmed
+    to belong to the authenticated user, else None.
+    """
+
+    def __init__(self, request):
+        self.user_id = request.user.pk if request.user.is_authenticated else None
+        claimed = request.auth.get("developer_id", None) if request.auth else None
+        self.developer_id = (
+            claimed
+            if claimed and self.user_id and developer_exists(claimed, self.user_id)
+            else None
+        )
+
+
+def authz_context(request):
+    """The request's AuthzContext, shared by its permissions and querysets"""
+    context = getattr(request, "_authz_context", None)
+    if context is None:
+        context = request._authz_context = AuthzContext(request)
+    return context
 
 
 class IsAppOwner(BasePermission):
@@ -7,12 +32,7 @@ class IsAppOwner(BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        developer_id = request.auth.get("developer_id", None)
-
-        if developer_id:
-            return Developer.objects.filter(user=request.user, id=developer_id).exists()
-
-        return False
+        return authz_context(request).developer_id is not None
 
 
 class IsDeveloper(BasePermission):
@@ -20,9 +40,4 @@ class IsDeveloper(BasePermission):
         if not request.user.is_authenticated:
             return False
 
-        dev_id = request.auth.get("developer_id", None)
-
-        if dev_id:
-            return Developer.objects.filter(id=dev_id, user=request.user).exists()
-
-        return False
+        return authz_context(request).developer_id is not None
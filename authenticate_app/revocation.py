@@ -0,0 +1,182 @@
+import hashlib
+import math
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import App, Revocation
+from .periodic import PeriodicSync
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings; never yields false negatives"""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RevocationList(PeriodicSync):
+    """Per-worker view of the Revocation table
+
+    A Bloom filter answers the common "not revoked" case without touching
+    the exact map, and new rows are pulled incrementally by id every
+    SYNC_INTERVAL seconds. A full reload every FULL_RELOAD_INTERVAL picks up
+    rows committed out of id order and drops expired ones.
+    """
+
+    settings_name = "REVOCATION"
+
+    def __init__(self):
+        super().__init__()
+        self.bloom = self._new_bloom(settings.REVOCATION["BLOOM_CAPACITY"])
+        self.revoked = {}
+        self.last_seq = 0
+        self._added = None
+
+    def _new_bloom(self, capacity):
+        return BloomFilter(capacity, settings.REVOCATION["BLOOM_ERROR_RATE"])
+
+    def _insert(self, bloom, revoked, kind, value, revoked_at):
+        key = f"{kind}:{value}"
+        if key not in revoked:
+            if bloom.count >= bloom.capacity:
+                grown = self._new_bloom(bloom.capacity * 2)
+                for existing in revoked:
+                    grown.add(existing)
+                bloom = grown
+            bloom.add(key)
+        revoked[key] = max(revoked.get(key, 0), revoked_at)
+        return bloom
+
+    def _load(self, bloom, revoked, rows):
+        for _, kind, value, created_at in rows:
+            bloom = self._insert(
+                bloom, revoked, kind, value, math.floor(created_at.timestamp())
+            )
+        return bloom
+
+    def refresh(self, full):
+        with self._lock:
+            # Revocations this worker adds during a full reload are replayed
+            # onto the new snapshot.
+            self._added = [] if full else None
+        # Queried and built without the lock so `add()` never waits on it.
+        rows = list(
+            Revocation.objects.filter(
+                id__gt=0 if full else self.last_seq, expires_at__gt=timezone.now()
+            )
+            .order_by("id")
+            .values_list("id", "kind", "value", "created_at")
+        )
+        if rows:
+            last_seq = rows[-1][0]
+        else:
+            last_seq = 0 if full else self.last_seq
+        if full:
+            revoked = {}
+            bloom = self._load(
+                self._new_bloom(self.config["BLOOM_CAPACITY"]), revoked, rows
+            )
+
+        with self._lock:
+            if full:
+                rows, self._added = self._added, None
+            else:
+                bloom, revoked = self.bloom, self.revoked
+            bloom = self._load(bloom, revoked, rows)
+            # Publish the exact map before the filter so a positive filter
+            # hit always finds its entry.
+            self.revoked = revoked
+            self.bloom = bloom
+            self.last_seq = last_seq
+
+    def is_revoked(self, claims):
+        self.sync()
+        issued_at = claims.get("iat", 0)
+        candidates = [
+            (f"jti:{claims.get('jti')}", -math.inf),
+            (f"user:{claims.get('user_id')}", issued_at),
+            (f"app:{claims.get('app_id')}", issued_at),
+        ]
+        # Developer tokens vouch for their inline apps, or all of them.
+        candidates.extend(
+            (f"app:{app_id}", issued_at) for app_id in claims.get("app_ids", ())
+        )
+        if "app_count" in claims:
+            candidates.append((f"compact:{claims.get('developer_id')}", issued_at))
+        for key, issued in candidates:
+            # `iat` has whole seconds and revocation times are floored to
+            # match: tokens minted in the revoking second stay valid.
+            if key in self.bloom and issued < self.revoked.get(key, -math.inf):
+                return True
+        return False
+
+    def add(self, revocation):
+        """Applies a revocation written by this worker without waiting for sync"""
+        with self._lock:
+            if self._added is not None:
+                self._added.append(
+                    (
+                        revocation.id,
+                        revocation.kind,
+                        revocation.value,
+                        revocation.created_at,
+                    )
+                )
+            self.bloom = self._insert(
+                self.bloom,
+                self.revoked,
+                revocation.kind,
+                revocation.value,
+                math.floor(revocation.created_at.timestamp()),
+            )
+
+
+revocation_list = RevocationList()
+
+
+def revoke(jti=None, user_id=None, app_id=None):
+    """Revokes a single token by jti, or every token issued so far to a user
+    or for an app, including developer tokens vouching for the app"""
+    expires_at = timezone.now() + settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"]
+    owner_id = None
+    if app_id:
+        owner_id = (
+            App.objects.filter(id=app_id).values_list("developer_id", flat=True).first()
+        )
+    for kind, value in (
+        (Revocation.KIND_JTI, jti),
+        (Revocation.KIND_USER, user_id),
+        (Revocation.KIND_APP, app_id),
+        (Revocation.KIND_COMPACT, owner_id),
+    ):
+        if value:
+            revocation_list.add(
+                Revocation.objects.create(kind=kind, value=value, expires_at=expires_at)
+            )
+
+
+def is_revoked(claims):
+    """Checks decoded token claims against the revocation list"""
+    return revocation_list.is_revoked(claims)
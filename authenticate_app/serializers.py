@@ -4,7 +4,14 @@ from django.contrib.auth.hashers import make_password
 
 
 from .models import CustomUser, Developer, App, UserAppRegistration
+from .revocation import revoke
+from .tokens import CustomRefreshToken
 from rest_framework import serializers
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
 from django.contrib.auth.hashers import make_password
 
 
@@ -47,10 +54,8 @@ class SerializeDeveloper(serializers.ModelSerializer):
 
 
 class SerializeApp(serializers.ModelSerializer):
-    developers = SerializeDeveloper(read_only=True)
-    users_registered = serializers.PrimaryKeyRelatedField(
-        many=True, read_only=True, source="registrations.user"
-    )
+    developers = SerializeDeveloper(read_only=True, source="developer")
+    users_registered = serializers.SerializerMethodField()
 
     class Meta:
         model = App
@@ -66,6 +71,10 @@ class SerializeApp(serializers.ModelSerializer):
         def create(self, validated_data):
             return super().create(validated_data)
 
+    def get_users_registered(self, app):
+        # Reads the prefetched registrations instead of one query per app.
+        return [registration.user_id for registration in app.registrations.all()]
+
 
 class SerializeUserAppRegistration(serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all())
@@ -83,3 +92,28 @@ class SerializeUserAppRegistration(serializers.ModelSerializer):
             raise serializers.ValidationError("User is already registered to this app.")
 
         return UserAppRegistration.objects.create(**validated_data)
+
+
+class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = CustomRefreshToken
+
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    """Carries the developer claims forward, re-deriving them only when
+    their version moved, and rotates by revoking the old refresh jti"""
+
+    token_class = CustomRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        refresh.refresh_claims()
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            revoke(jti=refresh[api_settings.JTI_CLAIM])
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+
+        return data
@@ -0,0 +1,72 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import (
+    app_cache,
+    bump_membership_version,
+    claims_cache,
+    confirm_response_cache,
+    record_unregistration,
+    developer_apps_cache,
+    developer_cache,
+    registration_cache,
+    user_cache,
+)
+from .membership import membership_index
+from .models import App, CustomUser, Developer, UserAppRegistration
+
+
+def invalidate_claims(user_id):
+    confirm_response_cache.clear()
+    claims_cache.delete((user_id, None))
+    bump_membership_version("claims", user_id)
+
+
+def invalidate_user_apps(user_id):
+    confirm_response_cache.clear()
+    registration_cache.delete((user_id, None))
+    bump_membership_version("user_apps", user_id)
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+def invalidate_user(sender, instance, **kwargs):
+    confirm_response_cache.clear()
+    user_cache.delete(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Developer)
+def invalidate_developer(sender, instance, **kwargs):
+    developer_cache.delete((instance.pk, None))
+    developer_cache.delete((instance.pk, instance.user_id))
+    invalidate_claims(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=App)
+def invalidate_app(sender, instance, **kwargs):
+    confirm_response_cache.clear()
+    app_cache.delete(instance.pk)
+    developer_apps_cache.delete((instance.developer_id, None))
+    bump_membership_version("developer_apps", instance.developer_id)
+    user_id = (
+        Developer.objects.filter(id=instance.developer_id)
+        .values_list("user_id", flat=True)
+        .first()
+    )
+    if user_id:
+        invalidate_claims(user_id)
+
+
+@receiver([post_save, post_delete], sender=UserAppRegistration)
+def invalidate_registration(sender, instance, **kwargs):
+    invalidate_user_apps(instance.user_id)
+
+
+@receiver(post_save, sender=UserAppRegistration)
+def index_registration(sender, instance, **kwargs):
+    membership_index.add(instance.user_id, instance.app_id)
+
+
+@receiver(post_delete, sender=UserAppRegistration)
+def unindex_registration(sender, instance, **kwargs):
+    membership_index.remove(instance.user_id, instance.app_id)
+    record_unregistration(instance.user_id, instance.app_id)
@@ -1,3 +1,1351 @@
-from django.test import TestCase
+import io
+import json
+import math
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.contrib.auth.signals import user_login_failed
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, router
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import TokenBackendError
+
+from . import async_views, hashing, serializers, tokens, views
+from .bulk import CSVParser
+from .cache import (
+    LRUCache,
+    claims_cache,
+    confirm_response_cache,
+    current_version,
+    is_registered,
+    shared_cache,
+    user_app_ids,
+)
+from .db_routers import replica_reads
+from .hashing import HashingPoolSaturated
+from .keys import jwks, verifying_keys
+from .membership import MembershipIndex
+from .middleware import (
+    ConfirmFastPathMiddleware,
+    InstrumentationMiddleware,
+    ReplicaRoutingMiddleware,
+)
+from .models import App, CustomUser, Developer, Revocation, UserAppRegistration
+from .revocation import RevocationList, revocation_list, revoke
+from .tokens import (
+    CachedTokenBackend,
+    CustomRefreshToken,
+    decode_token,
+    token_backend,
+    token_cache,
+    token_digest,
+)
+
+NO_REVOCATION_SYNC = {**settings.REVOCATION, "SYNC_INTERVAL": 3600}
+MEMBERSHIP_INDEX = {**settings.MEMBERSHIP_INDEX, "ENABLED": True, "SYNC_INTERVAL": 3600}
+
+
+def write_during_queries(write):
+    """Runs `write` on another thread while each query executes; the list
+    returned records whether it finished without waiting for the query"""
+    finished = []
+
+    def wrapper(execute, sql, params, many, context):
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join(timeout=1)
+        finished.append(not thread.is_alive())
+        return execute(sql, params, many, context)
+
+    return wrapper, finished
+
+
+class ListQueryCountTests(TestCase):
+    """List endpoints must not issue queries per app or per registration"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="owner", password="pw")
+        self.developer = Developer.objects.create(user=self.user, company_name="Co")
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer "
+            + str(CustomRefreshToken.for_user(self.user).access_token)
+        )
+        self.registered = 0
+        revocation_list.sync(force=True)
+
+    def add_apps(self, count, users_per_app):
+        for _ in range(count):
+            app = App.objects.create(name="app", developer=self.developer)
+            for _ in range(users_per_app):
+                self.registered += 1
+                user = CustomUser.objects.create(username=f"user{self.registered}")
+                UserAppRegistration.objects.create(user=user, app=app)
+
+    def count_queries(self, url):
+        # Warm the per-worker lookup caches so both runs compare like for like.
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()["results"]
+
+    @override_settings(REVOCATION=NO_REVOCATION_SYNC)
+    def test_app_list_query_count_is_constant(self):
+        self.add_apps(2, 2)
+        small, _ = self.count_queries("/api/v1/apps/")
+        self.add_apps(20, 5)
+        large, apps = self.count_queries("/api/v1/apps/")
+
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 5)
+        self.assertEqual(len(apps), 22)
+        self.assertEqual(len(apps[-1]["developers"]["apps"]), 22)
+        self.assertEqual(sum(len(app["users_registered"]) for app in apps), 104)
+
+    @override_settings(REVOCATION=NO_REVOCATION_SYNC)
+    def test_developer_list_query_count_is_constant(self):
+        self.add_apps(2, 0)
+        small, _ = self.count_queries("/api/v1/developers/")
+        self.add_apps(30, 0)
+        large, developers = self.count_queries("/api/v1/developers/")
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(developers[0]["apps"]), 32)
+
+
+@override_settings(READ_REPLICAS={"ALIASES": ["replica_0"], "STALENESS_SECONDS": 5})
+class ReplicaRoutingTests(TestCase):
+    """Read-only requests read from a replica unless the caller just wrote"""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(username="writer", password="pw")
+        self.auth = "Bearer " + str(CustomRefreshToken.for_user(user).access_token)
+        self.factory = RequestFactory()
+
+    def route(self, method, view=None, model=App, status=200):
+        routed = {}
+
+        def record(request):
+            routed["read"] = router.db_for_read(model)
+            return HttpResponse(status=status)
+
+        view = view or record
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        middleware(getattr(self.factory, method)("/", HTTP_AUTHORIZATION=self.auth))
+        return routed.get("read")
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.route("get"), "replica_0")
+
+    def test_writes_read_from_primary(self):
+        self.assertEqual(self.route("post"), DEFAULT_DB_ALIAS)
+
+    def test_read_only_post_views_read_from_replica(self):
+        routed = {}
+
+        @replica_reads
+        def view(request):
+            routed["read"] = router.db_for_read(App)
+            return HttpResponse()
+
+        self.route("post", view=view)
+        self.assertEqual(routed["read"], "replica_0")
+
+    def test_writer_reads_from_primary_within_staleness_window(self):
+        self.route("post")
+        self.assertEqual(self.route("get"), DEFAULT_DB_ALIAS)
+
+    def test_failed_write_is_not_sticky(self):
+        self.route("post", status=400)
+        self.assertEqual(self.route("get"), "replica_0")
+
+    def test_revocations_always_read_from_primary(self):
+        self.assertEqual(self.route("get", model=Revocation), DEFAULT_DB_ALIAS)
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(router.db_for_read(App), DEFAULT_DB_ALIAS)
+
+
+class ConfirmFastPathTests(TestCase):
+    """The fast path answers exactly as the DRF confirm views do"""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(username="dev", password="pw")
+        member = CustomUser.objects.create_user(username="member", password="pw")
+        developer = Developer.objects.create(user=user, company_name="Co")
+        app = App.objects.create(name="app", developer=developer)
+        UserAppRegistration.objects.create(user=member, app=app)
+        revocation_list.sync(force=True)
+
+        def bearer(user):
+            return "Bearer " + str(CustomRefreshToken.for_user(user).access_token)
+
+        self.requests = [
+            ("/api/v1/confirm/developer/", {}, {"HTTP_AUTHORIZATION": bearer(user)}),
+            (
+                "/api/v1/confirm/developer/",
+                {"app_id": app.id},
+                {"HTTP_AUTHORIZATION": bearer(user)},
+            ),
+            (
+                "/api/v1/confirm/developer/",
+                {"app_id": "ap_missing"},
+                {"HTTP_AUTHORIZATION": bearer(user)},
+            ),
+            (
+                "/api/v1/confirm/user/",
+                {"app_id": app.id},
+                {"HTTP_AUTHORIZATION": bearer(member)},
+            ),
+            (
+                "/api/v1/confirm/user/",
+                {"app_id": app.id},
+                {"HTTP_AUTHORIZATION": bearer(user)},
+            ),
+            ("/api/v1/confirm/user/", {}, {"HTTP_X_USER_ID": "usr_missing"}),
+            ("/api/v1/confirm/user/", {}, {}),
+        ]
+
+    def answers(self, enabled):
+        config = {**settings.CONFIRM_FAST_PATH, "ENABLED": enabled}
+        with override_settings(CONFIRM_FAST_PATH=config):
+            return [
+                (response.status_code, response.json())
+                for response in (
+                    self.client.get(path, params, **headers)
+                    for path, params, headers in self.requests
+                )
+            ]
+
+    def test_fast_path_matches_drf_views(self):
+        self.assertEqual(self.answers(enabled=True), self.answers(enabled=False))
+
+
+@override_settings(
+    INSTRUMENTATION={
+        **settings.INSTRUMENTATION,
+        "SERVER_TIMING": True,
+        "METRICS_TOKEN": "s3cret",
+    }
+)
+class InstrumentationTests(TestCase):
+    """Requests report their phase timings and feed the /metrics histograms"""
+
+    def test_server_timing_and_metrics(self):
+        user = CustomUser.objects.create_user(username="timed", password="pw")
+        token = str(CustomRefreshToken.for_user(user).access_token)
+        response = self.client.get(
+            "/api/v1/confirm/user/", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+
+        timing = response["Server-Timing"]
+        self.assertIn("db;dur=", timing)
+        self.assertIn("jwt;dur=", timing)
+        self.assertIn("total;dur=", timing)
+        metrics = self.client.get(
+            "/metrics", HTTP_AUTHORIZATION="Bearer s3cret"
+        ).content.decode()
+        self.assertIn(
+            'authz_request_duration_seconds_count{view="confirm_user"}', metrics
+        )
+        self.assertIn(
+            'authz_request_phase_seconds_sum{view="confirm_user",phase="jwt"}', metrics
+        )
+
+    def test_middlewares_stay_async_under_asgi(self):
+        user = CustomUser.objects.create_user(username="timed")
+
+        async def view(request):
+            await CustomUser.objects.filter(pk=user.pk).aexists()
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(
+            ConfirmFastPathMiddleware(ReplicaRoutingMiddleware(view))
+        )
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get("/"))
+        self.assertIn("db;dur=", response["Server-Timing"])
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 401)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+
+    def test_timings_are_opt_in(self):
+        with override_settings(
+            INSTRUMENTATION={
+                **settings.INSTRUMENTATION,
+                "SERVER_TIMING": False,
+                "METRICS_TOKEN": "",
+            }
+        ):
+            self.assertNotIn("Server-Timing", self.client.get("/api/v1/confirm/user/"))
+            for auth in ({}, {"HTTP_AUTHORIZATION": "Bearer "}):
+                self.assertEqual(self.client.get("/metrics", **auth).status_code, 401)
+
+
+class AuthzContextTests(TestCase):
+    """Permissions and querysets share one developer lookup per request"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="owner", password="pw")
+        developer = Developer.objects.create(user=self.user, company_name="Co")
+        self.app = App.objects.create(name="app", developer=developer)
+        other = Developer.objects.create(
+            user=CustomUser.objects.create_user(username="other"), company_name="X"
+        )
+        App.objects.create(name="other", developer=other)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer "
+            + str(CustomRefreshToken.for_user(self.user).access_token)
+        )
+
+    @override_settings(REVOCATION=NO_REVOCATION_SYNC)
+    def test_developer_resolved_once_per_request(self):
+        with mock.patch(
+            "authenticate_app.permissions.developer_exists", return_value=True
+        ) as lookup:
+            response = self.client.get(f"/api/v1/apps/{self.app.id}/")
+        self.assertEqual(response.status_code, 200)
+        lookup.assert_called_once()
+
+    def test_app_list_only_has_own_apps(self):
+        response = self.client.get("/api/v1/apps/")
+        self.assertEqual(
+            [app["id"] for app in response.json()["results"]], [self.app.id]
+        )
+
+    def test_token_without_developer_claim_is_refused(self):
+        stranger = CustomUser.objects.create_user(username="stranger")
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer "
+            + str(CustomRefreshToken.for_user(stranger).access_token)
+        )
+        self.assertEqual(self.client.get("/api/v1/apps/").status_code, 403)
+
+
+class LRUCacheTests(TestCase):
+    """Per-worker caches expire, evict the least recently used and count"""
+
+    def setUp(self):
+        self.cache = LRUCache("test", max_size=2, ttl=10)
+
+    def later(self, seconds):
+        clock = mock.patch("authenticate_app.cache.time")
+        clock.start().monotonic.return_value = time.monotonic() + seconds
+        self.addCleanup(clock.stop)
+
+    def test_entries_expire_after_their_ttl(self):
+        self.cache.set("default", 1)
+        self.cache.set("short", 2, ttl=1)
+        self.later(5)
+        self.assertEqual(self.cache.get("default"), 1)
+        self.assertIsNone(self.cache.get("short"))
+        self.later(11)
+        self.assertIsNone(self.cache.get("default"))
+        self.assertEqual(self.cache.stats()["size"], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual((self.cache.get("a"), self.cache.get("c")), (1, 3))
+
+    def test_stats_count_hits_misses_and_evictions(self):
+        loads = []
+        for key in ("a", "a", "b", "c", "a"):
+            self.cache.get_or_set(key, lambda: loads.append(key) or key)
+        self.assertEqual(loads, ["a", "b", "c", "a"])
+        stats = self.cache.stats()
+        self.assertEqual(
+            (stats["hits"], stats["misses"], stats["evictions"], stats["size"]),
+            (1, 4, 2, 2),
+        )
+        self.assertEqual(stats["hit_rate"], 0.2)
+
+    def test_zero_size_disables_the_cache(self):
+        cache = LRUCache("off", max_size=0)
+        cache.set("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+
+class SharedMembershipTests(TestCase):
+    """Membership sets cached in any worker go stale when the version moves"""
+
+    def setUp(self):
+        developer = Developer.objects.create(
+            user=CustomUser.objects.create_user(username="dev"), company_name="Co"
+        )
+        self.app = App.objects.create(name="app", developer=developer)
+        self.user = CustomUser.objects.create_user(username="member")
+        self.registration = UserAppRegistration.objects.create(
+            user=self.user, app=self.app
+        )
+        # Another worker: its own local cache, the same shared cache.
+        self.other_worker = mock.patch(
+            "authenticate_app.cache.registration_cache", LRUCache("other")
+        )
+
+    def test_registration_delete_makes_other_workers_stale(self):
+        with self.other_worker:
+            self.assertEqual(user_app_ids(self.user.pk), {self.app.id})
+            with self.assertNumQueries(0):
+                self.assertEqual(user_app_ids(self.user.pk), {self.app.id})
+
+        version = current_version("user_apps", self.user.pk)
+        self.registration.delete()
+        self.assertNotEqual(current_version("user_apps", self.user.pk), version)
+
+        with self.other_worker, self.assertNumQueries(1):
+            self.assertEqual(user_app_ids(self.user.pk), frozenset())
+
+    def test_lost_version_is_reseeded_past_old_sets(self):
+        version = current_version("user_apps", self.user.pk)
+        shared_cache().delete(f"authz:user_apps:{self.user.pk}:version")
+        self.assertGreater(current_version("user_apps", self.user.pk), version)
+
+
+class TokenCacheTests(TestCase):
+    """Verified claims are cached by token digest, never past the token's exp"""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(username="user", password="pw")
+        self.access = CustomRefreshToken.for_user(user).access_token
+        token_cache.clear()
+
+    def cached_for(self, token):
+        _, expires_at = token_cache._data[token_digest(token)]
+        return expires_at - time.monotonic()
+
+    def test_second_decode_is_a_cache_hit(self):
+        token = str(self.access)
+        hits, decodes = token_cache.hits, tokens._decodes
+        first = token_backend.decode(token)
+        self.assertEqual(token_backend.decode(token), first)
+        self.assertEqual(token_cache.hits - hits, 1)
+        self.assertEqual(tokens._decodes - decodes, 1)
+
+    def test_entry_never_outlives_the_token(self):
+        self.access.set_exp(lifetime=timedelta(seconds=5))
+        token = str(self.access)
+        token_backend.decode(token)
+        self.assertLessEqual(self.cached_for(token), 5)
+
+        with mock.patch("authenticate_app.cache.time") as clock:
+            clock.monotonic.return_value = time.monotonic() + 6
+            self.assertIsNone(token_cache.get(token_digest(token)))
+
+        long_lived = str(CustomRefreshToken.for_user(CustomUser.objects.get()))
+        token_backend.decode(long_lived)
+        self.assertAlmostEqual(self.cached_for(long_lived), token_cache.ttl, delta=5)
+
+    def test_tampered_token_is_not_served_from_cache(self):
+        token = str(self.access)
+        token_backend.decode(token)
+        header, payload, signature = token.split(".")
+        flipped = "A" if signature[0] != "A" else "B"
+        for tampered in (
+            f"{header}.{payload}.{flipped}{signature[1:]}",
+            f"{header}.{payload[:-2]}{'AA' if payload[-2:] != 'AA' else 'BB'}"
+            f".{signature}",
+        ):
+            with self.subTest(tampered=tampered):
+                with self.assertRaises(TokenBackendError):
+                    token_backend.decode(tampered)
+                self.assertIsNone(decode_token(tampered))
+
+
+@override_settings(REVOCATION=NO_REVOCATION_SYNC)
+class TokenRefreshTests(TestCase):
+    """Refresh carries developer claims forward and re-derives changed ones"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="dev", password="pw")
+        self.developer = Developer.objects.create(user=self.user, company_name="Co")
+        self.app = App.objects.create(name="app", developer=self.developer)
+        self.refresh = str(CustomRefreshToken.for_user(self.user))
+        revocation_list.sync(force=True)
+
+    def refreshed(self, refresh=None):
+        return self.client.post(
+            "/api/v1/token/refresh/", {"refresh": refresh or self.refresh}
+        )
+
+    def access_claims(self, response):
+        self.assertEqual(response.status_code, 200)
+        return decode_token(response.json()["access"])
+
+    def test_unchanged_claims_are_carried_without_queries(self):
+        with self.assertNumQueries(0):
+            response = self.refreshed()
+        claims = self.access_claims(response)
+        self.assertEqual(claims["developer_id"], self.developer.id)
+        self.assertEqual(claims["app_ids"], [self.app.id])
+
+    def test_changed_claims_are_rederived(self):
+        new_app = App.objects.create(name="new", developer=self.developer)
+        claims = self.access_claims(self.refreshed())
+        self.assertEqual(sorted(claims["app_ids"]), sorted([self.app.id, new_app.id]))
+
+    @mock.patch.object(serializers.api_settings, "ROTATE_REFRESH_TOKENS", True)
+    def test_rotation_revokes_the_old_refresh_token(self):
+        response = self.refreshed()
+        self.assertEqual(response.status_code, 200)
+        rotated = response.json()["refresh"]
+
+        self.assertEqual(self.refreshed().status_code, 401)
+        self.assertEqual(self.refreshed(rotated).status_code, 200)
+
+
+class LoginTests(TestCase):
+    """Logins hash on the bounded pool, shed load and upgrade old hashes"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="user", password="pw")
+
+    def login(self, password="pw"):
+        return self.client.post(
+            "/api/v1/login/", {"username": "user", "password": password}
+        )
+
+    def async_login(self):
+        request = RequestFactory().post(
+            "/api/v1/login/",
+            {"username": "user", "password": "pw"},
+            content_type="application/json",
+        )
+        return async_to_sync(async_views.login_view)(request)
+
+    @mock.patch.object(hashing.hashing_pool, "submit", side_effect=HashingPoolSaturated)
+    def test_saturated_pool_answers_503_with_retry_after(self, submit):
+        retry_after = str(settings.PASSWORD_HASHING["RETRY_AFTER"])
+        for login in (self.login, self.async_login):
+            with self.subTest(login=login.__name__):
+                response = login()
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response["Retry-After"], retry_after)
+
+    def test_outdated_hash_is_upgraded_on_login(self):
+        hasher = get_hasher()
+        self.user.password = hasher.encode("pw", hasher.salt(), iterations=1000)
+        self.user.save(update_fields=["password"])
+
+        self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(
+            hasher.decode(self.user.password)["iterations"], hasher.iterations
+        )
+        self.assertEqual(self.login().status_code, 200)
+
+    def test_failed_login_sends_user_login_failed(self):
+        receiver = mock.Mock()
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+
+        self.assertEqual(self.login("wrong").status_code, 401)
+        receiver.assert_called_once()
+        credentials = receiver.call_args.kwargs["credentials"]
+        self.assertEqual(credentials["username"], "user")
+        self.assertNotEqual(credentials["password"], "wrong")
+
+
+class TokenIssueQueryTests(TestCase):
+    """Issuing tokens loads the developer claims in one joined query"""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(username="dev", password="pw")
+        developer = Developer.objects.create(user=user, company_name="Co")
+        for index in range(3):
+            App.objects.create(name=f"app{index}", developer=developer)
+
+    def test_login_and_token_cost_one_claims_query(self):
+        for url in ("/api/v1/login/", "/api/v1/token/"):
+            with self.subTest(url=url):
+                claims_cache.clear()
+                shared_cache().clear()
+                # The user, then the developer and its apps.
+                with self.assertNumQueries(2):
+                    response = self.client.post(
+                        url, {"username": "dev", "password": "pw"}
+                    )
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(1):
+                    self.client.post(url, {"username": "dev", "password": "pw"})
+
+
+@override_settings(REVOCATION=NO_REVOCATION_SYNC)
+class RevokeViewTests(TestCase):
+    """The revoke endpoint rejects malformed bodies instead of failing"""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(username="user", password="pw")
+        self.refresh = CustomRefreshToken.for_user(user)
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {self.refresh.access_token}"
+        )
+        revocation_list.sync(force=True)
+
+    def revoke(self, body):
+        return self.client.post("/api/v1/token/revoke/", body, format="json")
+
+    def test_non_object_body_is_rejected(self):
+        for body in ([{"all": True}], 5, "all"):
+            with self.subTest(body=body):
+                self.assertEqual(self.revoke(body).status_code, 400)
+
+    def test_non_string_refresh_is_rejected(self):
+        for refresh in (5, [str(self.refresh)], {"token": str(self.refresh)}):
+            with self.subTest(refresh=refresh):
+                self.assertEqual(self.revoke({"refresh": refresh}).status_code, 400)
+
+    def test_refresh_token_is_revoked_with_the_caller(self):
+        response = self.revoke({"refresh": str(self.refresh)})
+        self.assertEqual(response.json(), {"revoked": "token"})
+        self.assertIsNone(decode_token(str(self.refresh)))
+        self.assertEqual(self.revoke({}).status_code, 401)
+
+
+@override_settings(TOKEN_APP_IDS={"MAX_INLINE": 2})
+class CompactAppSetTests(TestCase):
+    """Developers with many apps get a fixed-size app_count claim"""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(username="dev", password="pw")
+        developer = Developer.objects.create(user=user, company_name="Co")
+        self.app_ids = [
+            App.objects.create(name=f"app{index}", developer=developer).id
+            for index in range(3)
+        ]
+        self.auth = "Bearer " + str(CustomRefreshToken.for_user(user).access_token)
+        revocation_list.sync(force=True)
+
+    def confirm(self, app_id):
+        return self.client.get(
+            "/api/v1/confirm/developer/",
+            {"app_id": app_id},
+            HTTP_AUTHORIZATION=self.auth,
+        )
+
+    def test_token_counts_the_apps(self):
+        claims = decode_token(self.auth.split()[1])
+        self.assertNotIn("app_ids", claims)
+        self.assertEqual(claims["app_count"], 3)
+
+    def test_confirm_checks_membership(self):
+        for mode in ("strict", "claims"):
+            with self.subTest(mode=mode), override_settings(
+                CONFIRM_VERIFICATION_MODE={"confirm_developer": mode}
+            ):
+                self.assertEqual(self.confirm(self.app_ids[2]).status_code, 200)
+                self.assertEqual(self.confirm("ap_unknown").status_code, 401)
+
+
+@override_settings(REVOCATION=NO_REVOCATION_SYNC)
+class ConfirmVerificationModeTests(TestCase):
+    """Claims mode answers like strict mode, from the token where it can"""
+
+    MODES = ("strict", "claims")
+
+    def setUp(self):
+        owner = CustomUser.objects.create_user(username="dev", password="pw")
+        self.developer = Developer.objects.create(user=owner, company_name="Co")
+        self.app = App.objects.create(name="app", developer=self.developer)
+        other = CustomUser.objects.create_user(username="other", password="pw")
+        self.other_developer = Developer.objects.create(user=other, company_name="Co")
+        self.user = CustomUser.objects.create_user(username="user", password="pw")
+        UserAppRegistration.objects.create(user=self.user, app=self.app)
+        self.developer_token = CustomRefreshToken.for_user(owner).access_token
+        self.user_token = CustomRefreshToken.for_user(self.user).access_token
+        revocation_list.sync(force=True)
+
+    def confirm(self, mode, kind, token, **headers):
+        with override_settings(CONFIRM_VERIFICATION_MODE={f"confirm_{kind}": mode}):
+            response = self.client.get(
+                f"/api/v1/confirm/{kind}/",
+                HTTP_AUTHORIZATION=f"Bearer {token}",
+                **{f"HTTP_{name}": value for name, value in headers.items()},
+            )
+        return response.status_code, response.json()
+
+    def assert_modes_agree(self, kind, token, **headers):
+        strict, claims = (
+            self.confirm(mode, kind, token, **headers) for mode in self.MODES
+        )
+        self.assertEqual(claims, strict)
+        return claims
+
+    def test_matching_header_is_answered_from_the_token(self):
+        for kind, token, headers in (
+            (
+                "developer",
+                self.developer_token,
+                {"X_DEVELOPER_ID": self.developer.id, "X_APP_ID": self.app.id},
+            ),
+            ("user", self.user_token, {"X_USER_ID": self.user.id}),
+        ):
+            with self.subTest(kind=kind):
+                code, body = self.assert_modes_agree(kind, token, **headers)
+                self.assertEqual((code, body["valid"]), (200, True))
+        confirm_response_cache.clear()
+        with self.assertNumQueries(0):
+            self.confirm(
+                "claims",
+                "developer",
+                self.developer_token,
+                X_DEVELOPER_ID=self.developer.id,
+                X_APP_ID=self.app.id,
+            )
+
+    def test_app_outside_the_token_is_rejected(self):
+        other_app = App.objects.create(name="other", developer=self.other_developer)
+        for kind, token, headers in (
+            ("developer", self.developer_token, {"X_DEVELOPER_ID": self.developer.id}),
+            ("user", self.user_token, {"X_USER_ID": self.user.id}),
+        ):
+            with self.subTest(kind=kind):
+                code, _ = self.assert_modes_agree(
+                    kind, token, X_APP_ID=other_app.id, **headers
+                )
+                self.assertEqual(code, 401)
+
+    def test_header_for_another_owner_falls_back_to_strict(self):
+        for kind, token, headers in (
+            (
+                "developer",
+                self.developer_token,
+                {"X_DEVELOPER_ID": self.other_developer.id, "X_APP_ID": self.app.id},
+            ),
+            (
+                "user",
+                self.user_token,
+                {"X_USER_ID": self.other_developer.user_id, "X_APP_ID": self.app.id},
+            ),
+        ):
+            with self.subTest(kind=kind):
+                code, _ = self.assert_modes_agree(kind, token, **headers)
+                self.assertEqual(code, 401)
+
+    def test_revoked_token_is_rejected(self):
+        revoke(jti=self.developer_token["jti"])
+        revoke(jti=self.user_token["jti"])
+        for kind, token in (
+            ("developer", self.developer_token),
+            ("user", self.user_token),
+        ):
+            with self.subTest(kind=kind):
+                code, _ = self.assert_modes_agree(kind, token)
+                self.assertEqual(code, 401)
+
+        claims = dict(self.developer_token.payload)
+        response = views.confirm_developer_from_claims(
+            claims, self.developer.id, self.app.id
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data["message"], "Token revoked")
+
+
+@override_settings(REVOCATION={**NO_REVOCATION_SYNC, "BLOOM_CAPACITY": 2})
+class RevocationListTests(TestCase):
+    """Each worker's list syncs new rows by id and reloads in full"""
+
+    def setUp(self):
+        self.revocations = RevocationList()
+        self.revocations.sync(force=True)
+        self.expires_at = timezone.now() + timedelta(days=1)
+
+    def revoke_elsewhere(self, value, **fields):
+        return Revocation.objects.create(
+            kind=Revocation.KIND_USER,
+            value=value,
+            expires_at=fields.pop("expires_at", self.expires_at),
+            **fields,
+        )
+
+    def revoked(self, user_id):
+        return self.revocations.is_revoked({"user_id": user_id, "iat": 0})
+
+    def minted_earlier(self, refresh):
+        claims = decode_token(str(refresh.access_token))
+        return {**claims, "iat": claims["iat"] - 1}
+
+    def test_tokens_minted_after_revoke_all_verify(self):
+        user = CustomUser.objects.create_user(username="user", password="pw")
+        old = CustomRefreshToken.for_user(user)
+        revoke(user_id=user.pk)
+        self.revocations.sync(force=True)
+        self.assertTrue(self.revocations.is_revoked(self.minted_earlier(old)))
+        for _ in range(5):
+            claims = decode_token(str(CustomRefreshToken.for_user(user).access_token))
+            self.assertIsNotNone(claims)
+            self.assertFalse(self.revocations.is_revoked(claims))
+
+    def test_sync_queries_do_not_block_local_revocations(self):
+        local = Revocation(
+            id=0,
+            kind=Revocation.KIND_USER,
+            value="local",
+            created_at=timezone.now() + timedelta(seconds=1),
+        )
+        for full in (False, True):
+            with self.subTest(full=full):
+                self.revoke_elsewhere(f"elsewhere{full}")
+                if full:
+                    self.revocations.last_full_load = -math.inf
+                wrapper, finished = write_during_queries(
+                    lambda: self.revocations.add(local)
+                )
+                with connection.execute_wrapper(wrapper):
+                    self.revocations.sync(force=True)
+                self.assertEqual(finished, [True])
+                self.assertTrue(self.revoked("local"))
+                self.assertTrue(self.revoked(f"elsewhere{full}"))
+
+    def test_bloom_filter_grows_without_false_negatives(self):
+        for index in range(5):
+            self.revoke_elsewhere(f"u{index}")
+        self.revocations.sync(force=True)
+        self.assertGreaterEqual(self.revocations.bloom.capacity, 5)
+        for index in range(5):
+            self.assertIn(f"user:u{index}", self.revocations.bloom)
+            self.assertTrue(self.revoked(f"u{index}"))
+        self.assertFalse(self.revoked("other"))
+
+    def test_incremental_sync_loads_only_new_rows(self):
+        self.revoke_elsewhere("u1")
+        self.assertFalse(self.revoked("u1"))
+        self.revocations.sync(force=True)
+        self.assertTrue(self.revoked("u1"))
+        last_seq = self.revocations.last_seq
+
+        self.revoke_elsewhere("u2")
+        with CaptureQueriesContext(connection) as queries:
+            self.revocations.sync(force=True)
+        self.assertEqual(len(queries), 1)
+        self.assertIn(f"> {last_seq}", queries[0]["sql"])
+        self.assertTrue(self.revoked("u2"))
+
+    def test_full_reload_drops_expired_and_finds_late_rows(self):
+        expiring = self.revoke_elsewhere("u1")
+        late = self.revoke_elsewhere("u2")
+        self.revocations.sync(force=True)
+        Revocation.objects.filter(id=expiring.id).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        # Committed out of id order, below what incremental syncs ask for.
+        late_id = late.id
+        late.delete()
+        self.revoke_elsewhere("u3", id=late_id)
+        self.revocations.sync(force=True)
+        self.assertTrue(self.revoked("u1"))
+        self.assertFalse(self.revoked("u3"))
+
+        self.revocations.last_full_load = -math.inf
+        self.revocations.sync(force=True)
+        self.assertFalse(self.revoked("u1"))
+        self.assertTrue(self.revoked("u3"))
+
+    def test_app_revocation_covers_developer_tokens(self):
+        user = CustomUser.objects.create_user(username="dev", password="pw")
+        developer = Developer.objects.create(user=user, company_name="Co")
+        app = App.objects.create(name="app", developer=developer)
+        other = App.objects.create(name="other", developer=developer)
+        inline = self.minted_earlier(CustomRefreshToken.for_user(user))
+        with override_settings(TOKEN_APP_IDS={"MAX_INLINE": 1}):
+            compact = self.minted_earlier(CustomRefreshToken.for_user(user))
+        self.assertIn(app.id, inline["app_ids"])
+        self.assertIn("app_count", compact)
+
+        revoke(app_id=app.id)
+        self.revocations.sync(force=True)
+        self.assertTrue(self.revocations.is_revoked(inline))
+        self.assertTrue(self.revocations.is_revoked(compact))
+        self.assertFalse(self.revocations.is_revoked({**inline, "app_ids": [other.id]}))
+
+
+@override_settings(REVOCATION=NO_REVOCATION_SYNC)
+class ConfirmResponseCacheTests(TestCase):
+    """Repeated confirms are served from encoded bytes, with ETag support"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="member", password="pw")
+        developer = Developer.objects.create(
+            user=CustomUser.objects.create_user(username="dev"), company_name="Co"
+        )
+        self.app = App.objects.create(name="app", developer=developer)
+        self.registration = UserAppRegistration.objects.create(
+            user=self.user, app=self.app
+        )
+        self.auth = "Bearer " + str(CustomRefreshToken.for_user(self.user).access_token)
+        revocation_list.sync(force=True)
+
+    def confirm(self, **headers):
+        return self.client.get(
+            "/api/v1/confirm/user/",
+            {"app_id": self.app.id},
+            HTTP_AUTHORIZATION=self.auth,
+            **headers,
+        )
+
+    def test_if_none_match_gets_304_without_queries(self):
+        first = self.confirm()
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.confirm(HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_membership_change_retires_cached_answer(self):
+        self.assertEqual(self.confirm().status_code, 200)
+        self.registration.delete()
+        self.assertEqual(self.confirm().status_code, 401)
+
+    def test_revoked_token_is_not_served_from_cache(self):
+        self.assertEqual(self.confirm().status_code, 200)
+        revoke(jti=decode_token(self.auth.split()[1])["jti"])
+        self.assertEqual(self.confirm().status_code, 401)
+
+    def test_async_view_serves_the_same_answer(self):
+        first = self.confirm()
+        confirm_response_cache.clear()
+        factory = RequestFactory()
+        for headers, code, body in (
+            ({}, 200, first.content),
+            ({"HTTP_IF_NONE_MATCH": first["ETag"]}, 304, b""),
+        ):
+            request = factory.get(
+                "/api/v1/confirm/user/",
+                {"app_id": self.app.id},
+                HTTP_AUTHORIZATION=self.auth,
+                **headers,
+            )
+            response = async_to_sync(async_views.confirm_user)(request)
+            self.assertEqual(response.status_code, code)
+            self.assertEqual(response.content, body)
+            self.assertEqual(response["ETag"], first["ETag"])
+
+
+@override_settings(MEMBERSHIP_INDEX=MEMBERSHIP_INDEX)
+class MembershipIndexTests(TestCase):
+    """The in-memory index answers registration checks without queries"""
+
+    def setUp(self):
+        developer = Developer.objects.create(
+            user=CustomUser.objects.create_user(username="dev"), company_name="Co"
+        )
+        self.apps = [
+            App.objects.create(name=f"app{index}", developer=developer)
+            for index in range(2)
+        ]
+        self.users = [
+            CustomUser.objects.create(username=f"user{index}") for index in range(3)
+        ]
+        for user in self.users[:2]:
+            UserAppRegistration.objects.create(user=user, app=self.apps[0])
+        self.index = MembershipIndex()
+        for module in ("cache", "signals"):
+            patcher = mock.patch(
+                f"authenticate_app.{module}.membership_index", self.index
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.index.reload()
+
+    def test_checks_need_no_queries(self):
+        with self.assertNumQueries(0):
+            self.assertTrue(is_registered(self.users[1].pk, self.apps[0].id))
+            self.assertFalse(is_registered(self.users[2].pk, self.apps[0].id))
+            self.assertFalse(is_registered(self.users[0].pk, self.apps[1].id))
+            self.assertFalse(is_registered("usr_unknown", self.apps[0].id))
+        self.assertEqual(self.index.stats()["registrations"], 2)
+
+    def test_signals_keep_index_current(self):
+        registration = UserAppRegistration.objects.create(
+            user=self.users[2], app=self.apps[0]
+        )
+        self.assertTrue(self.index.contains(self.users[2].pk, self.apps[0].id))
+        registration.delete()
+        self.assertFalse(self.index.contains(self.users[2].pk, self.apps[0].id))
+
+    def test_delete_in_another_worker_stops_validating(self):
+        registration = UserAppRegistration.objects.get(
+            user=self.users[0], app=self.apps[0]
+        )
+        # Another worker's index never sees the post_delete signal.
+        with mock.patch.object(self.index, "remove"):
+            registration.delete()
+        self.assertTrue(self.index.contains(self.users[0].pk, self.apps[0].id))
+        self.assertFalse(is_registered(self.users[0].pk, self.apps[0].id))
+
+    def test_delta_sync_picks_up_rows_without_signals(self):
+        UserAppRegistration.objects.bulk_create(
+            [UserAppRegistration(user=self.users[2], app=self.apps[1])]
+        )
+        self.assertFalse(self.index.contains(self.users[2].pk, self.apps[1].id))
+        self.index.sync(force=True)
+        self.assertTrue(self.index.contains(self.users[2].pk, self.apps[1].id))
+        self.assertEqual(self.index.stats()["registrations"], 3)
+
+    def test_delta_query_does_not_block_registration_signals(self):
+        UserAppRegistration.objects.bulk_create(
+            [UserAppRegistration(user=self.users[2], app=self.apps[1])]
+        )
+        wrapper, finished = write_during_queries(
+            lambda: self.index.add(self.users[1].pk, self.apps[1].id)
+        )
+        with connection.execute_wrapper(wrapper):
+            self.index.sync(force=True)
+        self.assertEqual(finished, [True])
+        self.assertTrue(self.index.contains(self.users[1].pk, self.apps[1].id))
+        self.assertTrue(self.index.contains(self.users[2].pk, self.apps[1].id))
+
+    def test_overflow_falls_back_to_lookup_cache(self):
+        with override_settings(
+            MEMBERSHIP_INDEX={**MEMBERSHIP_INDEX, "MAX_REGISTRATIONS": 1}
+        ):
+            self.index.reload()
+            self.assertTrue(self.index.stats()["overflowed"])
+            self.assertIsNone(self.index.contains(self.users[0].pk, self.apps[0].id))
+            self.assertTrue(is_registered(self.users[0].pk, self.apps[0].id))
+            with self.assertNumQueries(0):
+                self.index.sync(force=True)
+            self.assertTrue(self.index.overflowed)
+
+    def test_full_reload_runs_off_the_request_thread(self):
+        self.index.last_full_load -= MEMBERSHIP_INDEX["FULL_RELOAD_INTERVAL"]
+        with mock.patch("authenticate_app.membership.threading.Thread") as thread:
+            with self.assertNumQueries(0):
+                self.index.sync(force=True)
+                self.assertTrue(self.index.contains(self.users[0].pk, self.apps[0].id))
+        thread.return_value.start.assert_called_once_with()
+        self.assertTrue(self.index.reloading)
+
+    def test_changes_during_reload_are_replayed(self):
+        registration = UserAppRegistration.objects.get(
+            user=self.users[0], app=self.apps[0]
+        )
+        full_load = self.index._full_load
+
+        def load_then_delete(config):
+            loaded = full_load(config)
+            registration.delete()
+            return loaded
+
+        with mock.patch.object(self.index, "_full_load", load_then_delete):
+            self.index.reload()
+        self.assertFalse(self.index.contains(self.users[0].pk, self.apps[0].id))
+        self.assertTrue(self.index.contains(self.users[1].pk, self.apps[0].id))
+
+
+class KeyRotationTests(TestCase):
+    """EdDSA tokens carry a kid; retired keys verify until removed"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.private = {}
+        for kid in ("retired", "active"):
+            key = Ed25519PrivateKey.generate()
+            self.private[kid] = key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            ).decode()
+            Path(directory.name, f"{kid}.pub").write_bytes(
+                key.public_key().public_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PublicFormat.SubjectPublicKeyInfo,
+                )
+            )
+        overrides = override_settings(
+            SIMPLE_JWT={**settings.SIMPLE_JWT, "ALGORITHM": "EdDSA"},
+            JWT_KEYS_DIR=directory.name,
+            JWT_SIGNING_KID="active",
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        for cached in (verifying_keys, jwks):
+            cached.cache_clear()
+            self.addCleanup(cached.cache_clear)
+        self.backend = CachedTokenBackend("EdDSA", self.private["active"])
+
+    def payload(self):
+        return {"user_id": "usr_rotation", "exp": int(time.time()) + 60}
+
+    def test_signs_with_active_kid(self):
+        token = self.backend.encode(self.payload())
+        self.assertEqual(jwt.get_unverified_header(token)["kid"], "active")
+        self.assertEqual(self.backend.decode(token)["user_id"], "usr_rotation")
+
+    def test_retired_key_still_verifies(self):
+        token = jwt.encode(
+            self.payload(),
+            self.private["retired"],
+            algorithm="EdDSA",
+            headers={"kid": "retired"},
+        )
+        self.assertEqual(self.backend.decode(token)["user_id"], "usr_rotation")
+
+    def test_unknown_or_mismatched_kid_is_rejected(self):
+        for kid in ("gone", "active"):
+            token = jwt.encode(
+                self.payload(),
+                self.private["retired"],
+                algorithm="EdDSA",
+                headers={"kid": kid},
+            )
+            with self.subTest(kid=kid), self.assertRaises(TokenBackendError):
+                self.backend.decode(token)
+
+    def test_jwks_publishes_every_key_and_honours_etag(self):
+        response = self.client.get("/.well-known/jwks.json")
+        self.assertEqual(response.status_code, 200)
+        keys = response.json()["keys"]
+        self.assertEqual([key["kid"] for key in keys], ["active", "retired"])
+        for key in keys:
+            self.assertEqual(
+                (key["kty"], key["crv"], key["alg"], key["use"]),
+                ("OKP", "Ed25519", "EdDSA", "sig"),
+            )
+        cached = self.client.get(
+            "/.well-known/jwks.json", HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached["ETag"], response["ETag"])
+
+
+@override_settings(REVOCATION=NO_REVOCATION_SYNC)
+class ConfirmBatchTests(TestCase):
+    """Batch verdicts match the single confirm endpoints, in four queries"""
+
+    def setUp(self):
+        owner = CustomUser.objects.create_user(username="dev")
+        self.developer = Developer.objects.create(user=owner, company_name="Co")
+        self.app = App.objects.create(name="app", developer=self.developer)
+        other = Developer.objects.create(
+            user=CustomUser.objects.create_user(username="other"), company_name="Co"
+        )
+        self.other_app = App.objects.create(name="other", developer=other)
+        self.member = CustomUser.objects.create_user(username="member")
+        self.stranger = CustomUser.objects.create_user(username="stranger")
+        UserAppRegistration.objects.create(user=self.member, app=self.app)
+        self.tokens = {
+            user.pk: str(CustomRefreshToken.for_user(user).access_token)
+            for user in (owner, self.member, self.stranger)
+        }
+        self.owner = owner
+        self.scoped = str(
+            CustomRefreshToken.for_user(owner, app_id=self.app.id).access_token
+        )
+        revocation_list.sync(force=True)
+
+    def single(self, item):
+        """The same check through confirm_user or confirm_developer"""
+        headers = {}
+        if item.get("token"):
+            headers["HTTP_AUTHORIZATION"] = f"Bearer {item['token']}"
+        for field in ("user_id", "developer_id"):
+            if type(item.get(field)) == str:
+                headers[f"HTTP_X_{field.upper()}"] = item[field]
+        params = {"app_id": item["app_id"]} if item.get("app_id") else {}
+        kind = "developer" if item.get("type") == "developer" else "user"
+        return self.client.get(f"/api/v1/confirm/{kind}/", params, **headers)
+
+    def items(self):
+        member, stranger = self.tokens[self.member.pk], self.tokens[self.stranger.pk]
+        owner = self.tokens[self.owner.pk]
+        return [
+            {"type": "user", "token": member, "app_id": self.app.id},
+            {"type": "user", "token": stranger, "app_id": self.app.id},
+            {"type": "user", "token": member, "app_id": "ap_unknown"},
+            {"type": "user", "user_id": self.member.pk, "app_id": self.app.id},
+            {"type": "user", "token": member},
+            {"type": "developer", "token": owner, "app_id": self.app.id},
+            {"type": "developer", "token": owner, "app_id": self.other_app.id},
+            {"type": "developer", "token": self.scoped, "app_id": self.other_app.id},
+            {"type": "developer", "developer_id": self.developer.pk},
+            {"type": "user", "user_id": ["x"], "app_id": self.app.id},
+            {"type": "developer", "developer_id": {"x": 1}, "token": 7},
+        ]
+
+    def test_verdicts_match_single_endpoints(self):
+        items = self.items()
+        response = APIClient().post(
+            "/api/v1/confirm/batch/", {"items": items}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        for item, result in zip(items, response.json()["results"]):
+            single = self.single(item)
+            with self.subTest(item=item):
+                self.assertEqual(result.pop("status"), single.status_code)
+                self.assertEqual(result, single.json())
+
+    def test_non_object_body_is_rejected(self):
+        for body in ([{"items": self.items()}], 5, "items"):
+            with self.subTest(body=body):
+                response = APIClient().post(
+                    "/api/v1/confirm/batch/", body, format="json"
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_fixed_number_of_queries(self):
+        client = APIClient()
+        with self.assertNumQueries(4):
+            response = client.post(
+                "/api/v1/confirm/batch/", {"items": self.items()}, format="json"
+            )
+        self.assertEqual(len(response.json()["results"]), len(self.items()))
+
+
+class BulkImportTests(TestCase):
+    """Bulk imports report per-row errors and skip existing rows"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="taken", password="pw")
+        developer = Developer.objects.create(user=self.user, company_name="Co")
+        self.app = App.objects.create(name="app", developer=developer)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def user_row(self, username):
+        return {
+            "username": username,
+            "email": f"{username}@example.com",
+            "password": "pw",
+        }
+
+    def test_users_from_json(self):
+        response = self.client.post(
+            "/api/v1/users/bulk/",
+            [
+                self.user_row("alice"),
+                self.user_row("alice"),
+                self.user_row("taken"),
+                {"username": "bob"},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report["created"], report["skipped"]), (1, 0))
+        self.assertEqual([error["row"] for error in report["errors"]], [2, 4, 3])
+        self.assertTrue(CustomUser.objects.get(username="alice").check_password("pw"))
+
+    def test_users_from_csv(self):
+        body = "username,email,password\ncarol,carol@example.com,pw\n"
+        response = self.client.post(
+            "/api/v1/users/bulk/", body, content_type="text/csv"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created"], 1)
+
+    def test_non_list_body_is_rejected(self):
+        for body in ({"username": "dave"}, 5, True, "rows", None):
+            with self.subTest(body=body):
+                response = self.client.post(
+                    "/api/v1/users/bulk/",
+                    json.dumps(body),
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_csv_parser_yields_dicts(self):
+        rows = CSVParser().parse(io.BytesIO(b"user,app\nusr_1,ap_1\n"))
+        self.assertEqual(list(rows), [{"user": "usr_1", "app": "ap_1"}])
+
+    def test_registrations_skip_existing_and_reject_bad_rows(self):
+        member = CustomUser.objects.create_user(username="member")
+        UserAppRegistration.objects.create(user=member, app=self.app)
+        rows = [
+            {"user": self.user.pk, "app": self.app.id},
+            {"user": member.pk, "app": self.app.id},
+            {"user": self.user.pk, "app": "ap_unknown"},
+            {"user": ["x"], "app": self.app.id},
+            {"user": self.user.pk},
+            "not a row",
+        ]
+        response = self.client.post("/api/v1/registrations/bulk/", rows, format="json")
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report["created"], report["skipped"]), (1, 1))
+        self.assertEqual(
+            {error["row"]: error["errors"] for error in report["errors"]},
+            {
+                3: {"app": ['Invalid pk "ap_unknown" - object does not exist.']},
+                4: {"non_field_errors": ["user and app must be ids."]},
+                5: {"non_field_errors": ["user and app are required."]},
+                6: {"non_field_errors": ["user and app are required."]},
+            },
+        )
+        self.assertTrue(
+            UserAppRegistration.objects.filter(user=self.user, app=self.app).exists()
+        )
+
+    def test_import_bulk_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson") as handle:
+            handle.write(json.dumps({"user": self.user.pk, "app": self.app.id}) + "\n")
+            handle.write(json.dumps({"user": self.user.pk, "app": self.app.id}) + "\n")
+            handle.flush()
+            out, err = io.StringIO(), io.StringIO()
+            call_command(
+                "import_bulk", "registrations", handle.name, stdout=out, stderr=err
+            )
+        self.assertIn("Created 1, skipped 1 existing, 0 rejected", out.getvalue())
+        self.assertEqual(err.getvalue(), "")
+
+
+class ListPagingTests(TestCase):
+    """Lists page by cursor or stream as NDJSON in registration order"""
+
+    def setUp(self):
+        developer = Developer.objects.create(
+            user=CustomUser.objects.create_user(username="dev"), company_name="Co"
+        )
+        app = App.objects.create(name="app", developer=developer)
+        self.users = [
+            UserAppRegistration.objects.create(
+                user=CustomUser.objects.create_user(username=f"user{index}"), app=app
+            ).user_id
+            for index in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(developer.user)
+
+    def test_cursor_pages(self):
+        seen, url = [], "/api/v1/registrations/?page_size=1"
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page["results"]), 1)
+            seen.extend(row["user"] for row in page["results"])
+            url = page["next"]
+        self.assertEqual(seen, self.users)
+
+    def test_ndjson_stream(self):
+        response = self.client.get("/api/v1/registrations/", {"stream": "ndjson"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["user"] for line in lines], self.users)
@@ -0,0 +1,240 @@
+import hashlib
+import threading
+import time
+
+import jwt
+from django.conf import settings
+from jwt import algorithms
+from rest_framework_simplejwt.backends import ALLOWED_ALGORITHMS, TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .cache import (
+    LRUCache,
+    adeveloper_app_ids,
+    claims_version,
+    developer_app_ids,
+    developer_claims,
+)
+from .instrumentation import timed
+from .keys import ASYMMETRIC_ALGORITHMS, signing_kid, verifying_keys
+from .revocation import is_revoked
+
+token_cache = LRUCache(
+    "token",
+    max_size=settings.TOKEN_CACHE["MAX_SIZE"],
+    ttl=settings.TOKEN_CACHE["TTL"],
+)
+
+_stats_lock = threading.Lock()
+_decodes = 0
+_decode_seconds = 0.0
+
+
+def token_digest(token):
+    if isinstance(token, str):
+        token = token.encode()
+    return hashlib.sha256(token).digest()
+
+
+class CachedTokenBackend(TokenBackend):
+    """Token backend that remembers verified claims by token digest
+
+    Entries never outlive the token's own `exp`, so a cached token expires
+    exactly when a fresh decode would start rejecting it. With an asymmetric
+    algorithm, tokens carry a `kid` header selecting the verifying key.
+    """
+
+    def _validate_algorithm(self, algorithm):
+        # simplejwt 5.3 only knows RS*/ES*; PyJWT also signs PS* and EdDSA.
+        if algorithm in ALLOWED_ALGORITHMS or algorithm not in ASYMMETRIC_ALGORITHMS:
+            return super()._validate_algorithm(algorithm)
+        if not algorithms.has_crypto:
+            raise TokenBackendError(
+                f"You must have cryptography installed to use {algorithm}."
+            )
+
+    def encode(self, payload):
+        with timed("sign"):
+            return self._encode(payload)
+
+    def _encode(self, payload):
+        kid = signing_kid()
+        if kid is None:
+            return super().encode(payload)
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload["aud"] = self.audience
+        if self.issuer is not None:
+            jwt_payload["iss"] = self.issuer
+        return jwt.encode(
+            jwt_payload,
+            self.signing_key,
+            algorithm=self.algorithm,
+            headers={"kid": kid},
+            json_encoder=self.json_encoder,
+        )
+
+    def get_verifying_key(self, token):
+        keys = verifying_keys()
+        if not keys:
+            return super().get_verifying_key(token)
+        try:
+            kid = jwt.get_unverified_header(token).get("kid") or signing_kid()
+        except jwt.InvalidTokenError as ex:
+            raise TokenBackendError("Token is invalid or expired") from ex
+        if kid not in keys:
+            raise TokenBackendError("Token signed with an unknown key")
+        return keys[kid]
+
+    def decode(self, token, verify=True):
+        with timed("jwt"):
+            return self._decode(token, verify)
+
+    def _decode(self, token, verify):
+        if not verify:
+            return super().decode(token, verify=False)
+
+        key = token_digest(token)
+        claims = token_cache.get(key)
+        if claims is None:
+            started = time.perf_counter()
+            try:
+                claims = super().decode(token)
+            finally:
+                record_decode(time.perf_counter() - started)
+            remaining = claims.get("exp", 0) - time.time()
+            if remaining > 0:
+                token_cache.set(key, claims, min(token_cache.ttl, remaining))
+        return dict(claims)
+
+
+token_backend = CachedTokenBackend(
+    api_settings.ALGORITHM,
+    api_settings.SIGNING_KEY,
+    api_settings.VERIFYING_KEY,
+    api_settings.AUDIENCE,
+    api_settings.ISSUER,
+    api_settings.JWK_URL,
+    api_settings.LEEWAY,
+    api_settings.JSON_ENCODER,
+)
+
+
+DEVELOPER_CLAIMS = (
+    "developer_id",
+    "stripe_account",
+    "app_id",
+    "app_ids",
+    "app_count",
+    "claims_version",
+)
+
+
+def token_app_ids(claims):
+    """App ids a token vouches for, or None if it carries none.
+
+    Small sets travel in the token as `app_ids`. Above
+    TOKEN_APP_IDS["MAX_INLINE"] the token only counts them (`app_count`),
+    and the developer's current apps come from the membership cache.
+    """
+    if "app_ids" in claims:
+        return claims["app_ids"]
+    if "app_count" in claims and claims.get("developer_id"):
+        return developer_app_ids(claims["developer_id"])
+    return None
+
+
+async def atoken_app_ids(claims):
+    if "app_ids" in claims:
+        return claims["app_ids"]
+    if "app_count" in claims and claims.get("developer_id"):
+        return await adeveloper_app_ids(claims["developer_id"])
+    return None
+
+
+class RevocationCheckMixin:
+    def verify(self):
+        super().verify()
+        if is_revoked(self.payload):
+            raise TokenError("Token has been revoked")
+
+
+class CachedAccessToken(RevocationCheckMixin, AccessToken):
+    """AccessToken verified through the shared decoded-token cache"""
+
+    _token_backend = token_backend
+
+
+class CustomRefreshToken(RevocationCheckMixin, RefreshToken):
+    _token_backend = token_backend
+    access_token_class = CachedAccessToken
+
+    @classmethod
+    def for_user(cls, user, app_id=None):
+        refresh = super().for_user(user)
+        refresh.set_developer_claims(user.pk, app_id)
+        return refresh
+
+    def set_developer_claims(self, user_id, app_id=None):
+        # Read the version first: a change racing the load then shows up
+        # as a stale version and is re-derived on the next refresh.
+        version = claims_version(user_id)
+        self.apply_developer_claims(developer_claims(user_id), app_id, version)
+
+    def apply_developer_claims(self, claims, app_id=None, version=None):
+        for claim in DEVELOPER_CLAIMS:
+            self.payload.pop(claim, None)
+        if claims:
+            self["developer_id"] = claims["developer_id"]
+            if claims["stripe_account"]:
+                self["stripe_account"] = claims["stripe_account"]
+            app_ids = claims["app_ids"]
+            if app_id and app_id in app_ids:
+                self["app_id"] = app_id
+            if len(app_ids) > settings.TOKEN_APP_IDS["MAX_INLINE"]:
+                # Keeps the token size bounded however many apps there are.
+                self["app_count"] = len(app_ids)
+            else:
+                self["app_ids"] = list(app_ids)
+        if version is not None:
+            self["claims_version"] = version
+
+    def refresh_claims(self):
+        """Re-derives the developer claims only if they changed since the
+        token was minted, so refreshing is normally a pure CPU operation"""
+        user_id = self.payload.get(api_settings.USER_ID_CLAIM)
+        version = claims_version(user_id)
+        if version is None or version != self.payload.get("claims_version"):
+            self.set_developer_claims(user_id, self.payload.get("app_id"))
+
+
+def decode_token(token):
+    """Returns the verified claims of `token`, or None if it is not valid or
+    has been revoked"""
+    try:
+        claims = token_backend.decode(token)
+    except TokenBackendError:
+        return None
+    return None if is_revoked(claims) else claims
+
+
+def record_decode(seconds):
+    global _decodes, _decode_seconds
+    with _stats_lock:
+        _decodes += 1
+        _decode_seconds += seconds
+
+
+def token_cache_stats():
+    stats = token_cache.stats()
+    average = _decode_seconds / _decodes if _decodes else 0.0
+    stats.update(
+        {
+            "decodes": _decodes,
+            "decode_seconds": _decode_seconds,
+            "decode_seconds_saved": average * stats["hits"],
+        }
+    )
+    return stats
@@ -1,5 +1,8 @@
 from django.urls import path
-from .views import login_view, confirm_developer, confirm_user
+from .views import (
+    confirm_batch,
+    revoke_view,
+)
 from rest_framework.routers import DefaultRouter
 from .views import (
     CustomUserViewSet,
@@ -8,15 +11,23 @@ from .views import (
     UserAppRegistrationViewSet,
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from django.conf import settings
+from . import async_views, views
 
 router = DefaultRouter()
 
+views_module = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
-    path("login/", login_view, name="login"),
+    path("login/", views_module.login_view, name="login"),
     path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
-    path("confirm/developer/", confirm_developer, name="confirm_developer"),
-    path("confirm/user/", confirm_user, name="confirm_developer"),
+    path("token/revoke/", revoke_view, name="token_revoke"),
+    path(
+        "confirm/developer/", views_module.confirm_developer, name="confirm_developer"
+    ),
+    path("confirm/user/", views_module.confirm_user, name="confirm_developer"),
+    path("confirm/batch/", confirm_batch, name="confirm_batch"),
 ]
 
 router.register(r"users", CustomUserViewSet)
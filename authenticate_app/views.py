@@ -1,27 +1,69 @@
+import csv
+import hashlib
+import json
+
 from django.shortcuts import render
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth import authenticate
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import (
+    api_view,
+    authentication_classes,
+    permission_classes,
+)
 from .models import Developer, App, UserAppRegistration, CustomUser
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
 from rest_framework import viewsets
+from rest_framework.parsers import JSONParser
 from .serializers import (
     SerializeApp,
     SerializeCustomUSer,
     SerializeDeveloper,
     SerializeUserAppRegistration,
 )
-from .permissions import IsAppOwner, IsDeveloper
-from mock_auth.settings import SIMPLE_JWT
-import jwt
+from .bulk import CSVParser, import_registrations, import_users
+from .pagination import (
+    IdCursorPagination,
+    RegistrationCursorPagination,
+    StreamingListMixin,
+)
+from .permissions import IsAppOwner, IsDeveloper, authz_context
+from .cache import (
+    app_developer_id,
+    confirm_response_cache,
+    current_version,
+    developer_app_ids,
+    developer_exists,
+    is_registered,
+    user_exists,
+)
+from .db_routers import replica_reads
+from .revocation import is_revoked, revoke
+from .hashing import HashingPoolSaturated, pooled_authenticate
+from .instrumentation import render_metrics
+from .keys import jwks
+from .tokens import CustomRefreshToken, decode_token, token_app_ids, token_digest
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import HttpResponse
+
+
+def bulk_import_response(request, importer):
+    rows = request.data
+    if not isinstance(rows, (list, csv.DictReader)):
+        return Response(
+            {"error": "Expected a JSON list or CSV rows"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    report = importer(rows)
+    code = status.HTTP_201_CREATED if report["created"] else status.HTTP_200_OK
+    return Response(report, status=code)
 
 
-class CustomUserViewSet(viewsets.ModelViewSet):
+class CustomUserViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = SerializeCustomUSer
+    pagination_class = IdCursorPagination
 
     def get_permissions(self):
         if self.action == "create":
@@ -37,19 +79,53 @@ class CustomUserViewSet(viewsets.ModelViewSet):
         serializer.save()
         return Response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=["post"],
+        parser_classes=[JSONParser, CSVParser],
+    )
+    def bulk(self, request):
+        """Bulk user import from a JSON list or CSV body"""
+        return bulk_import_response(request, import_users)
+
 
-class UserAppRegistrationViewSet(viewsets.ModelViewSet):
+class UserAppRegistrationViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = UserAppRegistration.objects.all()
     serializer_class = SerializeUserAppRegistration
+    pagination_class = RegistrationCursorPagination
     permission_classes = [IsAuthenticated]
 
+    @action(
+        detail=False,
+        methods=["post"],
+        parser_classes=[JSONParser, CSVParser],
+    )
+    def bulk(self, request):
+        """Bulk registration import from a JSON list or CSV body"""
+        return bulk_import_response(request, import_registrations)
+
 
-class AppViewSet(viewsets.ModelViewSet):
+class AppViewSet(StreamingListMixin, viewsets.ModelViewSet):
     serializer_class = SerializeApp
+    pagination_class = IdCursorPagination
     permission_classes = [IsAuthenticated, IsAppOwner]
 
     def get_queryset(self):
-        return App.objects.filter(developer__user=self.request.user)
+        # IsAppOwner already resolved the caller's developer; no user join.
+        developer_id = authz_context(self.request).developer_id
+        return (
+            App.objects.filter(developer_id=developer_id)
+            .select_related("developer")
+            .prefetch_related(
+                Prefetch(
+                    "developer__apps", queryset=App.objects.only("id", "developer")
+                ),
+                Prefetch(
+                    "registrations",
+                    queryset=UserAppRegistration.objects.only("id", "app", "user"),
+                ),
+            )
+        )
 
     def get_permissions(self):
         if self.action == "create":
@@ -72,11 +148,20 @@ class AppViewSet(viewsets.ModelViewSet):
         serializer.save(developer=developer)
 
 
-class DeveloperViewSet(viewsets.ModelViewSet):
+class DeveloperViewSet(StreamingListMixin, viewsets.ModelViewSet):
     serializer_class = SerializeDeveloper
+    pagination_class = IdCursorPagination
 
     def get_queryset(self):
-        return Developer.objects.filter(user=self.request.user)
+        developer_id = authz_context(self.request).developer_id
+        developers = (
+            Developer.objects.filter(pk=developer_id)
+            if developer_id
+            else Developer.objects.filter(user=self.request.user)
+        )
+        return developers.prefetch_related(
+            Prefetch("apps", queryset=App.objects.only("id", "developer"))
+        )
 
     def get_permissions(self):
         if self.action == "create":
@@ -98,24 +183,22 @@ class DeveloperViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class CustomRefreshToken(RefreshToken):
-    @classmethod
-    def for_user(cls, user, app_id=None):
-        refresh = super().for_user(user)
-
-        if hasattr(user, "developer_profile"):
-            developer = Developer.objects.get(user=user)
-            refresh["developer_id"] = developer.id
-            if developer.stripe_account_id:
-                refresh["stripe_account"] = developer.stripe_account_id
-            app_ids = developer.apps.values_list("id", flat=True)
-            if app_id and app_id in app_ids:
-                refresh["app_id"] = app_id
-                refresh["app_ids"] = list(app_ids)
-            else:
-                refresh["app_ids"] = list(app_ids)
+def login_overloaded(response_class):
+    """503 telling clients when to retry a login the hashing pool turned away"""
+    response = response_class(
+        {"error": "Too many concurrent logins, retry later"},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+    response["Retry-After"] = str(settings.PASSWORD_HASHING["RETRY_AFTER"])
+    return response
 
-        return refresh
+
+def issue_tokens(user, app_id=None):
+    refresh = CustomRefreshToken.for_user(user, app_id)
+    return {
+        "refresh_token": str(refresh),
+        "access_token": str(refresh.access_token),
+    }
 
 
 @api_view(["POST"])
@@ -124,54 +207,98 @@ def login_view(request):
     password = request.data.get("password")
     app_id = request.data.get("app_id")
 
-    user = authenticate(username=username, password=password)
+    try:
+        user = pooled_authenticate(username, password, request)
+    except HashingPoolSaturated:
+        return login_overloaded(Response)
     if user:
-        refresh = CustomRefreshToken.for_user(user, app_id)
-
-        payload = {
-            "refresh_token": str(refresh),
-            "access_token": str(refresh.access_token),
-        }
-        return Response(payload, status=status.HTTP_200_OK)
+        return Response(issue_tokens(user, app_id), status=status.HTTP_200_OK)
 
     return Response({"error": "Unauthorized"}, status=401)
 
 
-#### Confirmation views ####
-def decode_token(token):
-    try:
-        decoded = jwt.decode(
-            token, SIMPLE_JWT["SIGNING_KEY"], algorithms=[SIMPLE_JWT["ALGORITHM"]]
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def revoke_view(request):
+    """Revokes the calling token, plus an optional refresh token of the same
+    user, or with `"all": true` every token issued to the caller so far"""
+    if not isinstance(request.data, dict):
+        return Response(
+            {"error": "Expected a JSON object"}, status=status.HTTP_400_BAD_REQUEST
         )
-        return decoded
-    except jwt.DecodeError:
-        return None
+    if request.data.get("all") is True:
+        revoke(user_id=request.user.pk)
+        return Response({"revoked": "all"}, status=status.HTTP_200_OK)
+
+    refresh_jti = None
+    if request.data.get("refresh"):
+        refresh = request.data["refresh"]
+        refresh = decode_token(refresh) if isinstance(refresh, str) else None
+        if not refresh or refresh.get("user_id") != request.user.pk:
+            return Response(
+                {"error": "Invalid refresh token"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        refresh_jti = refresh.get("jti")
+
+    revoke(jti=request.auth.get("jti"))
+    revoke(jti=refresh_jti)
+    return Response({"revoked": "token"}, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@authentication_classes([])
+def jwks_view(request):
+    """Publishes the token verifying keys as a JSON Web Key Set"""
+    body, etag = jwks()
+    if request.headers.get("If-None-Match") == etag:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    response["Cache-Control"] = f"public, max-age={settings.JWKS_MAX_AGE}"
+    return response
+
+
+def metrics_view(request):
+    """Prometheus text exposition of request timings and cache/pool stats,
+    for bearers of METRICS_TOKEN only"""
+    token = settings.INSTRUMENTATION["METRICS_TOKEN"]
+    if not token or request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+#### Confirmation views ####
+TOKEN_HEADERS = ("Authorization", "X-Developer-Token", "X-User-Token")
+
+
+def token_claims(request):
+    """Merges the claims of every valid bearer token sent with the request"""
+    claims = {}
+    for header in TOKEN_HEADERS:
+        value = request.headers.get(header)
+        if value and value.startswith("Bearer "):
+            decoded = decode_token(value.split("Bearer ")[1])
+            if decoded:
+                claims.update(decoded)
+    return claims
+
+
+def trusts_claims(view_name):
+    """True when `view_name` answers from verified token claims alone"""
+    return settings.CONFIRM_VERIFICATION_MODE.get(view_name) == "claims"
 
 
-def confirm_credentials(request):
+def confirm_credentials(request, claims=None):
     """Confirms Credentials"""
-    token = request.headers.get("Authorization")
-    developer_token = request.headers.get("X-Developer-Token")
-    user_token = request.headers.get("X-User-Token")
     developer_id = request.headers.get("X-Developer-ID")
     user_id = request.headers.get("X-User-ID")
     app_id = request.headers.get("X-App-ID")
 
-    payload = {}
-    if token and token.startswith("Bearer "):
-        token = token.split("Bearer ")[1]
-        new_payload = decode_token(token)
-        payload.update(new_payload)
-
-    if developer_token and developer_token.startswith("Bearer "):
-        token = token.split("Bearer ")[1]
-        new_payload = decode_token(token)
-        payload.update(new_payload)
-
-    if user_token and user_token.startswith("Bearer "):
-        token = token.split("Bearer ")[1]
-        new_payload = decode_token(token)
-        payload.update(new_payload)
+    payload = dict(token_claims(request) if claims is None else claims)
 
     if developer_id:
         if app_id:
@@ -196,20 +323,89 @@ def confirm_credentials(request):
         return payload
 
 
-@api_view(["GET"])
-def confirm_developer(request):
-    """Confirms Developer"""
-    payload = confirm_credentials(request)
-    app_id = (
-        payload.get("app_id")
-        if payload.get("app_id")
-        else request.query_params.get("app_id")
+def confirm_developer_from_claims(claims, developer_id, app_id):
+    """Answers confirm_developer from a verified token, or None to fall back"""
+    if not developer_id or claims.get("developer_id") != developer_id:
+        return None
+    if is_revoked(claims):
+        return Response(
+            {"valid": False, "message": "Token revoked"},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    if app_id and type(app_id) == str:
+        app_ids = token_app_ids(claims)
+        if app_ids is None:
+            return None
+        if app_id not in app_ids:
+            return Response(
+                {
+                    "valid": False,
+                    "message": f"{['Invalid app_id', 'not in developer app']}",
+                },
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+    return Response(
+        {
+            "valid": True,
+            "developer_id": f"{developer_id}",
+            "app_id": f"{app_id}",
+            "message": "Developer confirmed",
+        },
+        status=status.HTTP_200_OK,
     )
+
+
+def confirm_user_from_claims(claims, user_id, app_id):
+    """Answers confirm_user from a verified token, or None to fall back
+
+    Tokens carry no user registrations, so an app check goes through the
+    cached registration lookup instead of the user, app and registration
+    round trips of the strict path.
+    """
+    if not user_id or claims.get("user_id") != user_id:
+        return None
+    if is_revoked(claims):
+        return Response(
+            {"valid": False, "message": "Token revoked"},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    if app_id and not is_registered(user_id, app_id):
+        return Response(
+            {
+                "valid": False,
+                "message": f"{['Invalid app_id', 'User not Registered to app']}",
+            },
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    return Response(
+        {
+            "valid": True,
+            "user_id": f"{user_id}",
+            "app_id": f"{app_id}",
+            "message": "User confirmed",
+        },
+        status=status.HTTP_200_OK,
+    )
+
+
+def developer_confirmation(request, query_app_id=None):
+    """Confirms Developer; `request` may be a plain HttpRequest"""
+    claims = token_claims(request)
+    payload = confirm_credentials(request, claims)
+    if isinstance(payload, Response):
+        return payload
+    app_id = payload.get("app_id") if payload.get("app_id") else query_app_id
     developer_id = payload.get("developer_id")
 
+    if trusts_claims("confirm_developer"):
+        response = confirm_developer_from_claims(claims, developer_id, app_id)
+        if response is not None:
+            return response
+
     if app_id and type(app_id) == str:
-        if payload.get("app_ids"):
-            if app_id not in payload["app_ids"]:
+        app_ids = token_app_ids(claims)
+        if app_ids:
+            if app_id not in app_ids or app_id not in developer_app_ids(developer_id):
                 return Response(
                     {
                         "valid": False,
@@ -218,21 +414,18 @@ def confirm_developer(request):
                     status=status.HTTP_401_UNAUTHORIZED,
                 )
             else:
-                developer = Developer.objects.get(id=developer_id)
-                if developer:
-                    return Response(
-                        {
-                            "valid": True,
-                            "developer_id": f"{developer_id}",
-                            "app_id": f"{app_id}",
-                            "message": "Developer confirmed",
-                        },
-                        status=status.HTTP_200_OK,
-                    )
+                return Response(
+                    {
+                        "valid": True,
+                        "developer_id": f"{developer_id}",
+                        "app_id": f"{app_id}",
+                        "message": "Developer confirmed",
+                    },
+                    status=status.HTTP_200_OK,
+                )
 
     if developer_id and type(developer_id) == str:
-        developer = Developer.objects.get(id=developer_id)
-        if developer:
+        if developer_exists(developer_id):
             return Response(
                 {
                     "valid": True,
@@ -248,26 +441,28 @@ def confirm_developer(request):
     )
 
 
-@api_view(["GET"])
-def confirm_user(request):
-    payload = confirm_credentials(request)
-    app_id = (
-        payload.get("app_id")
-        if payload.get("app_id")
-        else request.query_params.get("app_id")
-    )
+def user_confirmation(request, query_app_id=None):
+    """Confirms User; `request` may be a plain HttpRequest"""
+    claims = token_claims(request)
+    payload = confirm_credentials(request, claims)
+    if isinstance(payload, Response):
+        return payload
+    app_id = payload.get("app_id") if payload.get("app_id") else query_app_id
     user_id = payload.get("user_id")
 
+    if trusts_claims("confirm_user"):
+        response = confirm_user_from_claims(claims, user_id, app_id)
+        if response is not None:
+            return response
+
     if app_id:
-        user = CustomUser.objects.get(id=user_id)
-        if user:
-            app = App.objects.get(id=app_id)
-            if not app:
+        if user_exists(user_id):
+            if app_developer_id(app_id) is None:
                 return Response(
                     {"valid": False, "message": "Invalid app_id"},
                     status=status.HTTP_401_UNAUTHORIZED,
                 )
-            registered = UserAppRegistration.objects.filter(user=user, app=app).exists()
+            registered = is_registered(user_id, app_id)
             if registered:
                 return Response(
                     {
@@ -287,8 +482,7 @@ def confirm_user(request):
                     status=status.HTTP_401_UNAUTHORIZED,
                 )
     if user_id:
-        user = CustomUser.objects.get(id=user_id)
-        if user:
+        if user_exists(user_id):
             return Response(
                 {
                     "valid": True,
@@ -302,3 +496,248 @@ def confirm_user(request):
         {"valid": False, "message": "Unauthorized"},
         status=status.HTTP_401_UNAUTHORIZED,
     )
+
+
+CONFIRMATIONS = {
+    # kind: (confirmation, membership set it reads, owner claim, owner header)
+    "developer": (
+        developer_confirmation,
+        "developer_apps",
+        "developer_id",
+        "X-Developer-ID",
+    ),
+    "user": (user_confirmation, "user_apps", "user_id", "X-User-ID"),
+}
+CONFIRM_ID_HEADERS = ("X-Developer-ID", "X-User-ID", "X-App-ID")
+_UNSET = object()
+
+
+def encode_confirmation(data):
+    # Same bytes DRF's JSONRenderer produces with its default settings.
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def confirmation_key(kind, request, query_app_id, version=_UNSET):
+    """Everything a confirm answer depends on, short of running it
+
+    Only tokens that still verify (and are not revoked) are part of the
+    key, so revoking a token also retires its cached answers. The owner's
+    membership version moves whenever any worker changes the set; async
+    callers look it up themselves and pass it in.
+    """
+    digests, claims = [], {}
+    for header in TOKEN_HEADERS:
+        value = request.headers.get(header)
+        if value and value.startswith("Bearer "):
+            raw = value.split("Bearer ")[1]
+            decoded = decode_token(raw)
+            if decoded:
+                digests.append(token_digest(raw))
+                claims.update(decoded)
+    if version is _UNSET:
+        membership, owner_id = confirmation_owner(kind, request, claims)
+        version = current_version(membership, owner_id) if owner_id else None
+    header_ids = tuple(request.headers.get(header) for header in CONFIRM_ID_HEADERS)
+    return (
+        kind,
+        tuple(digests),
+        header_ids,
+        query_app_id,
+        settings.CONFIRM_VERIFICATION_MODE.get(f"confirm_{kind}"),
+        version,
+    )
+
+
+def confirmation_owner(kind, request, claims):
+    """Membership set and owner id a confirm answer reads"""
+    _, membership, owner_claim, owner_header = CONFIRMATIONS[kind]
+    return membership, request.headers.get(owner_header) or claims.get(owner_claim)
+
+
+def encoded_confirmation(result):
+    """(status, body, ETag) of a confirmation Response"""
+    body = encode_confirmation(result.data)
+    return (result.status_code, body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def confirmation_http_response(request, entry):
+    code, body, etag = entry
+    if code == status.HTTP_200_OK and etag in request.headers.get("If-None-Match", ""):
+        response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = HttpResponse(body, status=code, content_type="application/json")
+    if code == status.HTTP_200_OK:
+        response["ETag"] = etag
+        # Gateways may keep the answer but must revalidate every time.
+        response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def confirmation_response(kind, request, query_app_id=None):
+    """Pre-encoded confirm answer, with an ETag honoured on If-None-Match"""
+    key = confirmation_key(kind, request, query_app_id)
+    entry = confirm_response_cache.get(key)
+    if entry is None:
+        confirm = CONFIRMATIONS[kind][0]
+        entry = encoded_confirmation(confirm(request, query_app_id))
+        confirm_response_cache.set(key, entry)
+    return confirmation_http_response(request, entry)
+
+
+@api_view(["GET"])
+@authentication_classes([])
+def confirm_developer(request):
+    """Confirms Developer"""
+    return confirmation_response(
+        "developer", request, request.query_params.get("app_id")
+    )
+
+
+@api_view(["GET"])
+@authentication_classes([])
+def confirm_user(request):
+    return confirmation_response("user", request, request.query_params.get("app_id"))
+
+
+BATCH_FIELDS = ("user_id", "developer_id", "app_id", "token")
+
+
+def _batch_item(item):
+    """An item's fields, with anything but a string treated as missing"""
+    if type(item) != dict:
+        return {}
+    fields = {
+        field: item[field] for field in BATCH_FIELDS if type(item.get(field)) == str
+    }
+    fields["type"] = item.get("type")
+    return fields
+
+
+def _batch_token_claims(token):
+    if not token:
+        return {}
+    if token.startswith("Bearer "):
+        token = token.split("Bearer ")[1]
+    return decode_token(token) or {}
+
+
+def _batch_app_id(item, claims):
+    # As in the single views, an app-scoped token wins over the `app_id`
+    # the item asks about.
+    return claims.get("app_id") or item.get("app_id")
+
+
+def _developer_verdict(item, claims, developers, apps):
+    developer_id = item.get("developer_id") or claims.get("developer_id")
+    app_id = _batch_app_id(item, claims)
+
+    inline = claims.get("app_ids")
+    if app_id and type(app_id) == str and (inline or "app_count" in claims):
+        # A compact token is checked against the batch's own app query.
+        in_token = inline is None or app_id in inline
+        if not in_token or apps.get(app_id) != developer_id:
+            return {
+                "valid": False,
+                "message": f"{['Invalid app_id', 'not in developer app']}",
+            }, status.HTTP_401_UNAUTHORIZED
+        return {
+            "valid": True,
+            "developer_id": f"{developer_id}",
+            "app_id": f"{app_id}",
+            "message": "Developer confirmed",
+        }, status.HTTP_200_OK
+
+    if developer_id in developers:
+        return {
+            "valid": True,
+            "developer_id": f"{developer_id}",
+            "app_id": f"{app_id}",
+            "message": "Developer confirmed",
+        }, status.HTTP_200_OK
+    return {"valid": False, "message": "Unauthorized"}, status.HTTP_401_UNAUTHORIZED
+
+
+def _user_verdict(item, claims, users, apps, registrations):
+    user_id = item.get("user_id") or claims.get("user_id")
+    app_id = _batch_app_id(item, claims)
+
+    if user_id in users:
+        if app_id:
+            if app_id not in apps:
+                return {
+                    "valid": False,
+                    "message": "Invalid app_id",
+                }, status.HTTP_401_UNAUTHORIZED
+            if (user_id, app_id) not in registrations:
+                return {
+                    "valid": False,
+                    "message": f"{['Invalid app_id', 'User not Registered to app']}",
+                }, status.HTTP_401_UNAUTHORIZED
+        return {
+            "valid": True,
+            "user_id": f"{user_id}",
+            "app_id": f"{app_id}",
+            "message": "User confirmed",
+        }, status.HTTP_200_OK
+    return {"valid": False, "message": "Unauthorized"}, status.HTTP_401_UNAUTHORIZED
+
+
+@replica_reads
+@api_view(["POST"])
+@authentication_classes([])
+def confirm_batch(request):
+    """Confirms many users and developers with a fixed number of queries
+
+    Each item is `{"type": "user" | "developer", "token", "user_id",
+    "developer_id", "app_id"}`; results keep the order of the items and
+    carry the body and status code confirm_user/confirm_developer return.
+    """
+    items = request.data.get("items") if isinstance(request.data, dict) else None
+    if type(items) != list or not items:
+        return Response(
+            {"error": "items must be a non-empty list"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    if len(items) > settings.CONFIRM_BATCH_MAX_ITEMS:
+        return Response(
+            {"error": f"At most {settings.CONFIRM_BATCH_MAX_ITEMS} items per batch"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    entries = []
+    user_ids, developer_ids, app_ids = set(), set(), set()
+    for item in map(_batch_item, items):
+        claims = _batch_token_claims(item.get("token"))
+        entries.append((item, claims))
+        if item.get("type") == "developer":
+            developer_ids.add(item.get("developer_id") or claims.get("developer_id"))
+        else:
+            user_ids.add(item.get("user_id") or claims.get("user_id"))
+        app_ids.add(_batch_app_id(item, claims))
+    user_ids.discard(None)
+    developer_ids.discard(None)
+    app_ids.discard(None)
+
+    users = set(CustomUser.objects.filter(id__in=user_ids).values_list("id", flat=True))
+    developers = set(
+        Developer.objects.filter(id__in=developer_ids).values_list("id", flat=True)
+    )
+    apps = dict(App.objects.filter(id__in=app_ids).values_list("id", "developer_id"))
+    registrations = set(
+        UserAppRegistration.objects.filter(
+            user_id__in=users, app_id__in=apps
+        ).values_list("user_id", "app_id")
+    )
+
+    results = []
+    for item, claims in entries:
+        if not (claims or item.get("user_id") or item.get("developer_id")):
+            # Same answer confirm_credentials gives a request naming no one.
+            body = {"valid": "False", "message": "Invalid token"}
+            code = status.HTTP_401_UNAUTHORIZED
+        elif item.get("type") == "developer":
+            body, code = _developer_verdict(item, claims, developers, apps)
+        else:
+            body, code = _user_verdict(item, claims, users, apps, registrations)
+        results.append({"status": code, **body})
+    return Response({"results": results}, status=status.HTTP_200_OK)
@@ -29,7 +29,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "authenticate_app.middleware.InstrumentationMiddleware",
+    "authenticate_app.middleware.ConfirmFastPathMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "authenticate_app.middleware.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -64,12 +67,56 @@ WSGI_APPLICATION = "mock_auth.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {"default": dj_database_url.parse(os.getenv("DATABASE_URL"))}
-DATABASES["default"]["OPTIONS"] = {
-    "ssl": {
+# Keep connections (and their TLS sessions) open across requests.
+# Under ASGI every request gets its own connection, so default off.
+DB_CONNECTION = {
+    "conn_max_age": int(
+        os.getenv(
+            "DB_CONN_MAX_AGE",
+            "0" if os.getenv("ASYNC_VIEWS", "False") == "True" else "600",
+        )
+    ),
+    "conn_health_checks": os.getenv("DB_CONN_HEALTH_CHECKS", "True") == "True",
+}
+
+DATABASES = {
+    "default": dj_database_url.parse(os.getenv("DATABASE_URL"), **DB_CONNECTION)
+}
+if os.getenv("CA_CERT_PATH"):
+    DATABASES["default"].setdefault("OPTIONS", {})["ssl"] = {
         "ca": os.getenv("CA_CERT_PATH"),
     }
+# Postgres only: psycopg's pool replaces persistent connections.
+if (
+    os.getenv("DB_POOL", "False") == "True"
+    and DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql"
+):
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"].setdefault("OPTIONS", {})["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+    }
+
+# Read-only requests (confirm, list/retrieve, permission checks) are routed
+# to these replicas; see authenticate_app.db_routers.
+READ_REPLICAS = {
+    "ALIASES": [],
+    # How far a replica may lag. A user who writes reads from the primary
+    # for this long afterwards, so they always see their own writes.
+    "STALENESS_SECONDS": float(os.getenv("READ_REPLICA_STALENESS_SECONDS", "5")),
 }
+for index, url in enumerate(
+    filter(None, os.getenv("DATABASE_REPLICA_URLS", "").split(","))
+):
+    alias = f"replica_{index}"
+    DATABASES[alias] = dj_database_url.parse(url.strip(), **DB_CONNECTION)
+    DATABASES[alias]["OPTIONS"] = DATABASES["default"].get("OPTIONS", {})
+    DATABASES[alias]["CONN_MAX_AGE"] = DATABASES["default"]["CONN_MAX_AGE"]
+    DATABASES[alias]["TEST"] = {"MIRROR": "default"}
+    READ_REPLICAS["ALIASES"].append(alias)
+
+DATABASE_ROUTERS = ["authenticate_app.db_routers.ReplicaRouter"]
 
 
 # Password validation
@@ -90,6 +137,35 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing cost profiles. PASSWORD_HASH_PROFILE picks the hasher new
+# and rehashed passwords use; the others stay listed so existing hashes still
+# verify and are upgraded to the preferred profile on the next login.
+PASSWORD_HASH_COST = {
+    "PBKDF2_ITERATIONS": int(os.getenv("PBKDF2_ITERATIONS", "870000")),
+    "SCRYPT_WORK_FACTOR": int(os.getenv("SCRYPT_WORK_FACTOR", "16384")),
+    "ARGON2_TIME_COST": int(os.getenv("ARGON2_TIME_COST", "2")),
+    "ARGON2_MEMORY_COST": int(os.getenv("ARGON2_MEMORY_COST", "102400")),
+    "ARGON2_PARALLELISM": int(os.getenv("ARGON2_PARALLELISM", "8")),
+}
+PASSWORD_HASH_PROFILES = {
+    "pbkdf2": "authenticate_app.hashers.TunedPBKDF2PasswordHasher",
+    "scrypt": "authenticate_app.hashers.TunedScryptPasswordHasher",
+    "argon2": "authenticate_app.hashers.TunedArgon2PasswordHasher",
+}
+PASSWORD_HASH_PROFILE = os.getenv("PASSWORD_HASH_PROFILE", "pbkdf2")
+PASSWORD_HASHERS = (
+    [PASSWORD_HASH_PROFILES[PASSWORD_HASH_PROFILE]]
+    + [
+        hasher
+        for profile, hasher in PASSWORD_HASH_PROFILES.items()
+        if profile != PASSWORD_HASH_PROFILE
+    ]
+    + [
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+        "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    ]
+)
+
 AUTH_USER_MODEL = "authenticate_app.CustomUser"
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -98,13 +174,144 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
+    "DEFAULT_PAGINATION_CLASS": "authenticate_app.pagination.IdCursorPagination",
+    "PAGE_SIZE": int(os.getenv("LIST_PAGE_SIZE", "100")),
+}
+BULK_IMPORT = {
+    "CHUNK_SIZE": int(os.getenv("BULK_IMPORT_CHUNK_SIZE", "500")),
+    "HASH_WORKERS": int(
+        os.getenv("BULK_IMPORT_HASH_WORKERS", str(os.cpu_count() or 1))
+    ),
 }
+# Rows fetched per round trip when a list is streamed as NDJSON.
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "2000"))
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
-    "ALGORITHM": "HS256",
+    "ALGORITHM": os.getenv("JWT_ALGORITHM", "HS256"),
     "SIGNING_KEY": "your_secret_key_here",
+    # Rotation revokes the old refresh token's jti (see token/revoke/).
+    "ROTATE_REFRESH_TOKENS": os.getenv("JWT_ROTATE_REFRESH_TOKENS", "False") == "True",
+    "AUTH_TOKEN_CLASSES": ("authenticate_app.tokens.CachedAccessToken",),
+    "TOKEN_OBTAIN_SERIALIZER": "authenticate_app.serializers.CustomTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "authenticate_app.serializers.CustomTokenRefreshSerializer",
+}
+
+# Asymmetric signing (RS256, ES256, EdDSA, ...): JWT_KEYS_DIR holds
+# `<kid>.key` private and `<kid>.pub` public PEM files. JWT_SIGNING_KID picks
+# the active key; every `.pub` file is published and accepted for verifying.
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR", "")
+JWT_SIGNING_KID = os.getenv("JWT_SIGNING_KID", "")
+if JWT_KEYS_DIR and JWT_SIGNING_KID:
+    SIMPLE_JWT["SIGNING_KEY"] = Path(JWT_KEYS_DIR, f"{JWT_SIGNING_KID}.key").read_text()
+    SIMPLE_JWT["VERIFYING_KEY"] = Path(
+        JWT_KEYS_DIR, f"{JWT_SIGNING_KID}.pub"
+    ).read_text()
+JWKS_MAX_AGE = int(os.getenv("JWKS_MAX_AGE", "300"))
+
+# Token revocations live in the database; each worker pulls new rows every
+# SYNC_INTERVAL seconds and rebuilds its Bloom filter every
+# FULL_RELOAD_INTERVAL seconds.
+REVOCATION = {
+    "SYNC_INTERVAL": float(os.getenv("REVOCATION_SYNC_INTERVAL", "2")),
+    "FULL_RELOAD_INTERVAL": float(os.getenv("REVOCATION_FULL_RELOAD_INTERVAL", "300")),
+    "BLOOM_CAPACITY": int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000")),
+    "BLOOM_ERROR_RATE": float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001")),
+}
+
+# Optional per-worker index of user->app registrations for the confirm
+# checks: new rows are pulled every SYNC_INTERVAL seconds, a full reload
+# every FULL_RELOAD_INTERVAL seconds drops registrations deleted by other
+# workers; until then each worker logs its deletes in the shared cache for
+# DELETE_LOG_TTL seconds (keep it above FULL_RELOAD_INTERVAL) and positive
+# index answers are checked against that log. Past MAX_REGISTRATIONS the
+# lookup caches are used instead.
+MEMBERSHIP_INDEX = {
+    "ENABLED": os.getenv("MEMBERSHIP_INDEX", "False") == "True",
+    "SYNC_INTERVAL": float(os.getenv("MEMBERSHIP_INDEX_SYNC_INTERVAL", "2")),
+    "FULL_RELOAD_INTERVAL": float(
+        os.getenv("MEMBERSHIP_INDEX_FULL_RELOAD_INTERVAL", "3600")
+    ),
+    "DELTA_OVERLAP": float(os.getenv("MEMBERSHIP_INDEX_DELTA_OVERLAP", "5")),
+    "DELETE_LOG_TTL": float(os.getenv("MEMBERSHIP_INDEX_DELETE_LOG_TTL", "3900")),
+    "MAX_REGISTRATIONS": int(
+        os.getenv("MEMBERSHIP_INDEX_MAX_REGISTRATIONS", "5000000")
+    ),
+    "CHUNK_SIZE": int(os.getenv("MEMBERSHIP_INDEX_CHUNK_SIZE", "10000")),
+}
+
+# Developers with more apps than MAX_INLINE get only an `app_count` in
+# their tokens instead of the full `app_ids` list.
+TOKEN_APP_IDS = {
+    "MAX_INLINE": int(os.getenv("TOKEN_APP_IDS_MAX_INLINE", "20")),
+}
+
+# Verified claims cached by token digest, shared by the confirm views and
+# JWT authentication. Entries also expire with the token itself.
+TOKEN_CACHE = {
+    "MAX_SIZE": int(os.getenv("TOKEN_CACHE_MAX_SIZE", "50000")),
+    "TTL": float(os.getenv("TOKEN_CACHE_TTL", "300")),
+}
+
+# Confirm endpoint verification: "strict" checks every claim against the
+# database, "claims" answers from a signature-valid, unexpired token.
+CONFIRM_VERIFICATION_MODE = {
+    "confirm_developer": os.getenv("CONFIRM_DEVELOPER_MODE", "strict"),
+    "confirm_user": os.getenv("CONFIRM_USER_MODE", "strict"),
+}
+# Per-request query, JWT, signing and hashing timings, served on /metrics
+# to bearer METRICS_TOKEN (denied while unset) and, with SERVER_TIMING_HEADER,
+# sent to every caller as a Server-Timing header.
+INSTRUMENTATION = {
+    "ENABLED": os.getenv("INSTRUMENTATION", "True") == "True",
+    "SERVER_TIMING": os.getenv("SERVER_TIMING_HEADER", "False") == "True",
+    "METRICS_TOKEN": os.getenv("METRICS_TOKEN", ""),
+}
+# Serve login and the confirm endpoints from the async views; only useful
+# under an ASGI server (see Procfile.asgi).
+ASYNC_VIEWS = os.getenv("ASYNC_VIEWS", "False") == "True"
+# GET confirm requests on these paths are answered by
+# ConfirmFastPathMiddleware without the rest of the middleware or DRF.
+# The middleware is sync, so it is off by default under ASYNC_VIEWS.
+CONFIRM_FAST_PATH = {
+    "ENABLED": os.getenv("CONFIRM_FAST_PATH", str(not ASYNC_VIEWS)) == "True",
+    "PATHS": {
+        "/api/v1/confirm/developer/": "developer",
+        "/api/v1/confirm/user/": "user",
+    },
+}
+# Logins hash passwords on a bounded pool; once WORKERS are busy and
+# MAX_QUEUE more are waiting, logins get a 503 with Retry-After.
+PASSWORD_HASHING = {
+    "WORKERS": int(os.getenv("PASSWORD_HASHING_WORKERS", str(os.cpu_count() or 1))),
+    "MAX_QUEUE": int(os.getenv("PASSWORD_HASHING_MAX_QUEUE", "16")),
+    "RETRY_AFTER": int(os.getenv("PASSWORD_HASHING_RETRY_AFTER", "1")),
 }
+CONFIRM_BATCH_MAX_ITEMS = int(os.getenv("CONFIRM_BATCH_MAX_ITEMS", "500"))
+
+# Per-worker cache of developer, app and registration lookups. Entries are
+# dropped on model save/delete; TTL bounds staleness from other workers.
+AUTH_LOOKUP_CACHE = {
+    "MAX_SIZE": int(os.getenv("AUTH_LOOKUP_CACHE_MAX_SIZE", "10000")),
+    "TTL": float(os.getenv("AUTH_LOOKUP_CACHE_TTL", "30")),
+}
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "authz": {
+        "BACKEND": os.getenv(
+            "AUTHZ_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("AUTHZ_CACHE_LOCATION", "authz"),
+        "TIMEOUT": int(os.getenv("AUTHZ_CACHE_TIMEOUT", "3600")),
+    },
+}
+
+# Cache alias holding the user->apps and developer->apps membership sets
+# shared by all workers; an empty value keeps them per worker only.
+AUTHZ_SHARED_CACHE = os.getenv("AUTHZ_SHARED_CACHE", "authz")
 LANGUAGE_CODE = "en-us"
 
 TIME_ZONE = "UTC"
@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
+from authenticate_app.views import jwks_view, metrics_view
 
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/v1/", include("authenticate_app.urls")),
+    path(".well-known/jwks.json", jwks_view, name="jwks"),
+    path("metrics", metrics_view, name="metrics"),
 ]